@@ -0,0 +1,87 @@
+"""Общие части бенчмарков
+
+Импорт модуля включает offscreen-режим Qt и добавляет корень репозитория
+в sys.path, поэтому его импортируют первым. PyQt и sticky_notes
+загружаются только при вызове функций, которым они нужны.
+"""
+import importlib
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Приложение Qt должно жить до конца бенчмарка
+_qt_app = None
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def qt_application(widgets=True):
+    """Создает приложение Qt (один раз на процесс) и держит ссылку на него"""
+    global _qt_app
+    if _qt_app is None:
+        if widgets:
+            # sticky_notes при импорте задает атрибуты High DPI, нужные до создания QApplication
+            importlib.import_module("sticky_notes")
+            from PyQt5.QtWidgets import QApplication as application_class
+        else:
+            from PyQt5.QtCore import QCoreApplication as application_class
+        _qt_app = application_class.instance() or application_class(sys.argv)
+    return _qt_app
+
+
+def isolate_settings(workdir):
+    """Направляет QSettings во временную папку, чтобы не трогать настоящие заметки
+
+    На Windows пути применяются только к INI, поэтому настройки самого
+    бенчмарка передаются в make_app файлом.
+    """
+    from PyQt5.QtCore import QSettings
+    for settings_format in (QSettings.NativeFormat, QSettings.IniFormat):
+        QSettings.setPath(settings_format, QSettings.UserScope, os.path.join(workdir, "settings"))
+
+
+def make_app(workdir, database_path=None, screens=False, **settings):
+    """StickyNotesApp без трея и цикла событий с базой и настройками в workdir
+
+    Новая база сразу помечается перенесенной из QSettings, существующая
+    не меняется. settings записываются в INI-файл настроек приложения.
+    С screens=True подключается реестр экранов (для размещения заметок).
+    """
+    from PyQt5.QtCore import QSettings
+    import sticky_notes
+    from note_storage import NoteStore
+
+    database_path = database_path or os.path.join(workdir, "notes.db")
+    if not os.path.exists(database_path):
+        # В Windows QSettings живут в реестре: не переносим в тестовую базу настоящие заметки
+        store = NoteStore(database_path)
+        store.set_meta(NoteStore.LEGACY_MIGRATED_KEY, 1)
+        store.close()
+    app_settings = QSettings(os.path.join(workdir, "settings.ini"), QSettings.IniFormat)
+    for key, value in settings.items():
+        app_settings.setValue(key, value)
+
+    app = sticky_notes.StickyNotesApp.__new__(sticky_notes.StickyNotesApp)
+    app.initPersistence(database_path, app_settings)
+    if screens:
+        from screen_registry import ScreenRegistry
+        app.screens = ScreenRegistry.instance()
+        app.placement.set_screens(app.screenAreas())
+    return app
+
+
+def close_app(app):
+    """Дописывает отложенное, закрывает хранилища приложения и удаляет окна пула"""
+    app.persistence.stop()
+    app.journal.close()
+    app.history.close()
+    app.store.close()
+    app.note_pool.clear()
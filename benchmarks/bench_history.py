@@ -0,0 +1,75 @@
+"""Бенчмарк истории версий: рост хранилища и время восстановления ревизий
+
+Запуск: python benchmarks/bench_history.py [--edits 10000] [--size 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from _common import percentile
+
+from note_history import NoteHistory
+
+
+def simulate_edits(text, count, rng):
+    """Генерирует последовательность локальных правок: набор, удаление, вставка"""
+    alphabet = "абвгдеёжзийклмнопрстуфхцчшщыэюя abcdefghijklmnopqrstuvwxyz\n"
+    for _ in range(count):
+        position = rng.randint(0, len(text))
+        action = rng.random()
+        if action < 0.7:
+            text = text[:position] + "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 8))) + text[position:]
+        elif action < 0.9 and text:
+            text = text[:position] + text[position + rng.randint(1, 10):]
+        else:
+            text = text[:position] + "\n" + text[position:]
+        yield text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--edits", type=int, default=10000)
+    parser.add_argument("--size", type=int, default=2000, help="начальный размер текста, символов")
+    parser.add_argument("--restores", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        history = NoteHistory(os.path.join(tmp, "history.db"),
+                              max_revisions=args.edits, max_bytes=1 << 40)
+        text = "".join(rng.choice("абвгд efgh\n") for _ in range(args.size))
+        texts = [text]
+        raw_bytes = len(text.encode("utf-8"))
+        history.record(1, text)
+
+        started = time.perf_counter()
+        for text in simulate_edits(text, args.edits, rng):
+            history.record(1, text)
+            texts.append(text)
+            raw_bytes += len(text.encode("utf-8"))
+        record_time = time.perf_counter() - started
+
+        stats = history.stats()
+        print(f"Ревизий: {stats['revisions']}, снимков: {stats['snapshots']}")
+        print(f"Хранилище истории: {stats['bytes'] / 1024:.1f} КБ "
+              f"(полные копии заняли бы {raw_bytes / 1024:.1f} КБ, "
+              f"в {raw_bytes / max(1, stats['bytes']):.0f} раз больше)")
+        print(f"Запись ревизии: {record_time / args.edits * 1000:.3f} мс в среднем")
+
+        timings = []
+        for _ in range(args.restores):
+            revision = rng.randint(1, len(texts))
+            started = time.perf_counter()
+            restored = history.restore(1, revision)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert restored == texts[revision - 1], f"ревизия {revision} восстановлена неверно"
+        print(f"Восстановление: p50 {statistics.median(timings):.3f} мс, "
+              f"p95 {percentile(timings, 95):.3f} мс, max {max(timings):.3f} мс")
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
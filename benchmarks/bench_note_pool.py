@@ -0,0 +1,62 @@
+"""Бенчмарк создания новой заметки с пулом готовых окон и без него
+
+Работает без окон (QT_QPA_PLATFORM=offscreen) с отдельными QSettings и базой
+во временной папке. Замеряется createNewNote (окно, показ, запись на диск);
+между замерами заметка закрывается, а пул пополняется вне замера, как это
+происходит в простое.
+
+Запуск: python benchmarks/bench_note_pool.py [--repeat 200]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from _common import percentile, qt_application, isolate_settings, make_app, close_app
+
+from PyQt5.QtCore import QCoreApplication, QEvent
+
+import sticky_notes
+
+
+def measure(app, repeat):
+    timings = []
+    for _ in range(repeat):
+        # Пополнение пула и удаление окон — вне замера (в приложении это делается в простое)
+        while len(app.note_pool) < app.note_pool.spares:
+            app.note_pool.warmUp()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        started = time.perf_counter()
+        app.createNewNote()
+        QCoreApplication.processEvents()
+        timings.append((time.perf_counter() - started) * 1000)
+        app.closeNote(max(app.records))
+    close_app(app)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        isolate_settings(workdir)
+        qt_application()
+
+        results = {}
+        for name, pool_size in (("без пула", 0), ("с пулом", sticky_notes.WidgetPool.DEFAULT_MAX_SIZE)):
+            app = make_app(workdir, os.path.join(workdir, f"notes-{pool_size}.db"), screens=True,
+                           note_pool_size=pool_size)
+            timings = measure(app, args.repeat)
+            results[name] = timings
+            print(f"{name:>9}: p50 {statistics.median(timings):.2f} мс, "
+                  f"p95 {percentile(timings, 95):.2f} мс, max {max(timings):.2f} мс  "
+                  f"{app.note_pool.stats()}")
+        ratio = statistics.median(results["без пула"]) / statistics.median(results["с пулом"])
+        print(f"Новая заметка с пулом быстрее в {ratio:.1f} раза (p50)")
+
+
+if __name__ == "__main__":
+    main()
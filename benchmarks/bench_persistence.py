@@ -0,0 +1,198 @@
+"""Бенчмарк сохранения и загрузки заметок в зависимости от их числа и размера
+
+Работает без окон (QT_QPA_PLATFORM=offscreen) с отдельными QSettings и базой
+во временной папке, так что настоящие заметки не затрагиваются.
+
+Запуск:     python benchmarks/bench_persistence.py --output before.json
+Сравнение:  python benchmarks/bench_persistence.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from _common import ROOT, percentile, qt_application, isolate_settings, make_app, close_app
+
+from PyQt5.QtCore import QCoreApplication, QEvent
+
+from note_storage import normalize_record
+
+DEFAULT_COUNTS = [10, 100, 1000, 5000]
+DEFAULT_SIZES = [100, 10 * 1024, 1024 * 1024]
+
+
+def directory_size(path):
+    total = 0
+    for name in os.listdir(path):
+        full_path = os.path.join(path, name)
+        if os.path.isfile(full_path):
+            total += os.path.getsize(full_path)
+    return total
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+class PersistenceBenchmark:
+    """Замеры на экземпляре StickyNotesApp без трея и цикла событий"""
+
+    def __init__(self, workdir, visible_fraction):
+        self.workdir = workdir
+        self.visible_fraction = visible_fraction
+        self.results = []
+
+    def make_app(self, database_path):
+        return make_app(self.workdir, database_path)
+
+    def close_app(self, app):
+        for note_id in list(app.notes):
+            note = app.notes.pop(note_id)
+            note.dispose()
+            note.deleteLater()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        close_app(app)
+
+    def measure(self, name, count, size, repeat, action, data_dir):
+        timings = []
+        written = []
+        for i in range(repeat):
+            before = directory_size(data_dir)
+            started = time.perf_counter()
+            action(i)
+            timings.append((time.perf_counter() - started) * 1000)
+            written.append(max(0, directory_size(data_dir) - before))
+        result = {
+            "operation": name,
+            "notes": count,
+            "content_bytes": size,
+            "repeat": repeat,
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "bytes_written": int(sum(written) / len(written)),
+        }
+        self.results.append(result)
+        print(f"{name:>14} n={count:<5} size={size:<8} p50={result['p50_ms']:>9.3f} мс "
+              f"p95={result['p95_ms']:>9.3f} мс p99={result['p99_ms']:>9.3f} мс "
+              f"записано={result['bytes_written']} Б")
+
+    def run_case(self, count, size, repeat):
+        data_dir = tempfile.mkdtemp(dir=self.workdir)
+        database_path = os.path.join(data_dir, "notes.db")
+        app = self.make_app(database_path)
+        visible_count = int(count * self.visible_fraction)
+        content = "ж" * (size // 2)
+        for note_id in range(1, count + 1):
+            app.records[note_id] = normalize_record({
+                "content": content, "x": 10, "y": 10,
+                "visible": note_id <= visible_count,
+            })
+        app.saveNotes()
+        app.persistence.flush()
+
+        def save_all(i):
+            for record in app.records.values():
+                record["content"] = content[:-1] + str(i % 10)
+            app.saveNotes()
+            app.persistence.flush()
+
+        def save_one(i):
+            app.records[1]["content"] = content[:-1] + str(i % 10)
+            app.saveNotes([1])
+            app.persistence.flush()
+
+        self.measure("saveNotes", count, size, repeat, save_all, data_dir)
+        self.measure("saveNotes(1)", count, size, repeat * 5, save_one, data_dir)
+
+        note = app.materializeNote(1)
+
+        def save_settings(i):
+            note.move(20 + i, 20)
+            note.saveSettings()
+            app.persistence.flush()
+
+        self.measure("saveSettings", count, size, repeat * 5, save_settings, data_dir)
+        self.close_app(app)
+
+        def load_records(i):
+            loaded = self.make_app(database_path)
+            loaded.records = loaded.journal.load()
+            self.close_app(loaded)
+
+        def load_notes(i):
+            loaded = self.make_app(database_path)
+            loaded.loadNotes()
+            self.close_app(loaded)
+
+        # Старый loadSettings (чтение настроек заметок) теперь — одно чтение записей
+        self.measure("loadSettings", count, size, max(3, repeat // 2), load_records, data_dir)
+        self.measure("loadNotes", count, size, max(3, repeat // 2), load_notes, data_dir)
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["operation"], r["notes"], r["content_bytes"]): r for r in baseline["results"]}
+    print(f"\nСравнение с {baseline_path} ({baseline.get('revision')}):")
+    for result in results:
+        old = previous.get((result["operation"], result["notes"], result["content_bytes"]))
+        if not old or not old["p50_ms"]:
+            continue
+        ratio = result["p50_ms"] / old["p50_ms"]
+        mark = "  <-- медленнее" if ratio > 1.2 else ""
+        print(f"{result['operation']:>14} n={result['notes']:<5} size={result['content_bytes']:<8} "
+              f"p50 {old['p50_ms']:.3f} -> {result['p50_ms']:.3f} мс (x{ratio:.2f}){mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="размер текста одной заметки, байт")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--visible-fraction", type=float, default=0.1,
+                        help="доля видимых заметок (для них loadNotes создает окна)")
+    parser.add_argument("--max-total", type=int, default=256 * 1024 * 1024,
+                        help="пропускать сочетания, где общий объем текста больше, байт")
+    parser.add_argument("--output", default="bench_persistence.json")
+    parser.add_argument("--compare", help="JSON с прошлыми результатами для сравнения")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        isolate_settings(workdir)
+        qt_application()
+
+        benchmark = PersistenceBenchmark(workdir, args.visible_fraction)
+        for count in args.counts:
+            for size in args.sizes:
+                if count * size > args.max_total:
+                    print(f"{'пропуск':>14} n={count:<5} size={size:<8} (больше --max-total)")
+                    continue
+                benchmark.run_case(count, size, args.repeat)
+
+    report = {
+        "revision": git_revision(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": benchmark.results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {args.output}")
+
+    if args.compare:
+        compare(benchmark.results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
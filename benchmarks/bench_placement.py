@@ -0,0 +1,84 @@
+"""Бенчмарк поиска места для новой заметки и упорядочивания заметок
+
+Запуск: python benchmarks/bench_placement.py [--notes 100 1000 5000] [--queries 500]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from _common import percentile
+
+from note_layout import PlacementEngine, LAYOUTS
+
+# Два монитора рядом: 1920x1080 с панелью задач и 2560x1440
+SCREENS = [(0, 0, 1920, 1040), (1920, 0, 2560, 1440)]
+SIZES = [(200, 200), (300, 300), (400, 400)]
+
+
+def overlaps(rect, other):
+    return (rect[0] < other[0] + other[2] and other[0] < rect[0] + rect[2] and
+            rect[1] < other[1] + other[3] and other[1] < rect[1] + rect[3])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    for count in args.notes:
+        engine = PlacementEngine(SCREENS)
+        started = time.perf_counter()
+        for note_id in range(count):
+            screen = rng.choice(SCREENS)
+            width, height = rng.choice(SIZES)
+            engine.update(note_id, (rng.randint(screen[0], screen[0] + screen[2] - width),
+                                    rng.randint(screen[1], screen[1] + screen[3] - height),
+                                    width, height))
+        build_time = (time.perf_counter() - started) * 1000
+
+        timings = []
+        free = 0
+        for _ in range(args.queries):
+            screen = rng.choice(SCREENS)
+            anchor = (rng.randint(screen[0], screen[0] + screen[2] - 1),
+                      rng.randint(screen[1], screen[1] + screen[3] - 1))
+            started = time.perf_counter()
+            x, y = engine.find_place(300, 300, anchor)
+            timings.append((time.perf_counter() - started) * 1000)
+            if count <= 1000 and not any(overlaps((x, y, 300, 300), rect) for rect in engine.rects.values()):
+                free += 1
+        share = f", без перекрытия {free * 100 // args.queries}%" if count <= 1000 else ""
+        print(f"{count:>5} заметок: индекс {build_time:.1f} мс, поиск места p50 "
+              f"{statistics.median(timings):.3f} мс, p95 {percentile(timings, 95):.3f} мс, "
+              f"max {max(timings):.3f} мс{share}")
+
+    # Последовательное заполнение пустого экрана, как при создании заметок подряд
+    engine = PlacementEngine(SCREENS[:1])
+    timings = []
+    for note_id in range(60):
+        started = time.perf_counter()
+        x, y = engine.find_place(300, 300, (960, 520))
+        timings.append((time.perf_counter() - started) * 1000)
+        engine.update(note_id, (x, y, 300, 300))
+    print(f"Заполнение экрана 60 заметками подряд: p50 {statistics.median(timings):.3f} мс, "
+          f"max {max(timings):.3f} мс")
+
+    # Упорядочивание: расчет положений всех заметок
+    for count in args.notes:
+        notes = [(note_id, *rng.choice(SIZES)) for note_id in range(count)]
+        results = []
+        for name, layout in LAYOUTS.items():
+            timings = []
+            for _ in range(5):
+                started = time.perf_counter()
+                layout(notes, SCREENS)
+                timings.append((time.perf_counter() - started) * 1000)
+            results.append(f"{name} {min(timings):.1f} мс")
+        print(f"Упорядочивание {count:>5} заметок: " + ", ".join(results))
+
+
+if __name__ == "__main__":
+    main()
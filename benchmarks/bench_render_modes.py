@@ -0,0 +1,118 @@
+"""Бенчмарк режимов отображения: окно на заметку и одна поверхность на экран
+
+Каждый замер выполняется в отдельном процессе (QT_QPA_PLATFORM=offscreen,
+отдельные QSettings и база во временной папке), чтобы память режимов
+не смешивалась. Замеряются загрузка заметок (создание и показ), память
+процесса, шаг перетаскивания заметки и смена темы у всех заметок.
+
+Запуск: python benchmarks/bench_render_modes.py [--notes 100 500 2000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import qt_application, isolate_settings, make_app, close_app
+
+MODES = (("windows", "окно на заметку"), ("scene", "одна поверхность"))
+
+
+def memory_mb():
+    """Занятая процессом память (RSS), МБ, или None, если узнать нельзя"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def run_case(mode, count, workdir):
+    from PyQt5.QtCore import QCoreApplication, QPoint, Qt, qInstallMessageHandler
+
+    from note_storage import normalize_record
+
+    isolate_settings(workdir)
+    qt_application()
+    # offscreen не поддерживает маски окон и предупреждает об этом на каждый вызов
+    qInstallMessageHandler(lambda *args: None)
+
+    app = make_app(workdir, screens=True, render_mode=mode)
+
+    rng = random.Random(5)
+    area = app.screens.screens[0][1]
+    for note_id in range(1, count + 1):
+        app.records[note_id] = normalize_record({
+            "content": f"Заметка {note_id}\nСписок дел на сегодня", "visible": True,
+            "x": area.x() + rng.randint(0, max(0, area.width() - 300)),
+            "y": area.y() + rng.randint(0, max(0, area.height() - 300)),
+        })
+    app.saveNotes()
+    app.persistence.flush()
+    app.records = {}
+
+    memory_before = memory_mb()
+    started = time.perf_counter()
+    app.loadNotes()
+    QCoreApplication.processEvents()
+    load_ms = (time.perf_counter() - started) * 1000
+    memory_after = memory_mb()
+
+    note = app.notes[1]
+    note.pressGesture(100, 15, QPoint(1, 1), Qt.NoModifier)
+    drag = []
+    for step in range(1, 101):
+        started = time.perf_counter()
+        note.moveGesture(QPoint(1 + step * 3, 1 + step * 2))
+        QCoreApplication.processEvents()
+        drag.append((time.perf_counter() - started) * 1000)
+    note.releaseGesture()
+
+    started = time.perf_counter()
+    app.updateNotes(list(app.records.keys()), theme="glass")
+    QCoreApplication.processEvents()
+    theme_ms = (time.perf_counter() - started) * 1000
+
+    close_app(app)
+    return {
+        "load_ms": load_ms,
+        "memory_mb": None if memory_before is None else memory_after - memory_before,
+        "drag_p50_ms": statistics.median(drag),
+        "drag_max_ms": max(drag),
+        "theme_ms": theme_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "NOTES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with tempfile.TemporaryDirectory() as workdir:
+            print(json.dumps(run_case(args.child[0], int(args.child[1]), workdir)))
+        return
+
+    for count in args.notes:
+        for mode, title in MODES:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, str(count)],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            memory = "?" if result["memory_mb"] is None else f"{result['memory_mb']:.0f} МБ"
+            print(f"{count:>5} заметок, {title:<16}: загрузка {result['load_ms']:>7.0f} мс, "
+                  f"память {memory:>7}, перетаскивание p50 {result['drag_p50_ms']:.2f} мс "
+                  f"(max {result['drag_max_ms']:.1f}), смена темы {result['theme_ms']:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Бенчмарк полнотекстового и нечеткого поиска по заметкам
+
+Последний замер — первый запрос в приложении после загрузки заметок
+(индекс строится порциями в цикле событий); он работает без окон
+(QT_QPA_PLATFORM=offscreen) с базой во временной папке.
+
+Запуск: python benchmarks/bench_search.py [--notes 10000] [--words 80]
+"""
+import argparse
+import gc
+import random
+import statistics
+import tempfile
+import time
+
+from _common import percentile, qt_application, isolate_settings, make_app, close_app
+
+from note_search import InvertedIndex, TO_LATIN_LAYOUT
+
+SYLLABLES_RU = ["ка", "ро", "ми", "на", "те", "ль", "по", "за", "дё", "вы", "сть", "при", "вет", "ёж"]
+SYLLABLES_EN = ["ta", "ro", "mi", "ne", "sk", "lo", "pre", "on", "ing", "ex", "ou"]
+
+
+def make_vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        syllables = SYLLABLES_RU if rng.random() < 0.7 else SYLLABLES_EN
+        word = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        words.add(word.capitalize() if rng.random() < 0.2 else word)
+    return sorted(words)
+
+
+def typo(rng, word):
+    """Одна случайная опечатка: замена, пропуск или перестановка букв"""
+    if len(word) < 3:
+        return word
+    position = rng.randrange(1, len(word) - 1)
+    action = rng.random()
+    if action < 0.4:
+        return word[:position] + rng.choice("аеиоркнт") + word[position + 1:]
+    if action < 0.7:
+        return word[:position] + word[position + 1:]
+    return word[:position - 1] + word[position] + word[position - 1] + word[position + 1:]
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def report(name, timings):
+    print(f"{name:>28}: p50 {statistics.median(timings):.3f} мс, "
+          f"p95 {percentile(timings, 95):.3f} мс, max {max(timings):.3f} мс")
+
+
+def cold_first_query(texts, query, wait_for_index):
+    """Первый поиск после loadNotes: (мс загрузки, [мс итераций цикла событий], мс поиска)"""
+    from PyQt5.QtCore import QCoreApplication
+
+    from note_storage import normalize_record
+
+    with tempfile.TemporaryDirectory() as workdir:
+        isolate_settings(workdir)
+        qt_application()
+        app = make_app(workdir)
+        # Скрытые заметки: окна не создаются, замеряется только индекс
+        app.records = {note_id: normalize_record({"content": text, "visible": False})
+                       for note_id, text in texts.items()}
+        app.saveNotes()
+        app.persistence.flush()
+        app.records = {}
+
+        load_ms, _ = timed(app.loadNotes)
+        iterations = []
+        while wait_for_index and app.search_pending:
+            iterations.append(timed(QCoreApplication.processEvents)[0])
+            time.sleep(0.001)
+        search_ms, _ = timed(app.searchNotes, query, 50)
+        close_app(app)
+    return load_ms, iterations, search_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--words", type=int, default=80, help="слов в заметке")
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocabulary = make_vocabulary(rng, args.vocabulary)
+    texts = {note_id: " ".join(rng.choice(vocabulary) for _ in range(args.words))
+             for note_id in range(1, args.notes + 1)}
+
+    index = InvertedIndex()
+    build_time, _ = timed(index.rebuild, texts)
+    print(f"Индекс: {args.notes} заметок, {len(index.vocabulary)} слов, построение {build_time:.0f} мс")
+
+    edit_timings = []
+    for _ in range(args.queries):
+        note_id = rng.randint(1, args.notes)
+        texts[note_id] += " " + rng.choice(vocabulary)
+        edit_timings.append(timed(index.update, note_id, texts[note_id])[0])
+    report("обновление заметки", edit_timings)
+
+    cases = {
+        "одно слово": lambda: rng.choice(vocabulary).upper(),
+        "два слова": lambda: rng.choice(vocabulary) + " " + rng.choice(vocabulary),
+        "начало слова (3 буквы)": lambda: rng.choice(vocabulary)[:3],
+        "начало слова (1 буква)": lambda: rng.choice(vocabulary)[:1],
+        "слово + начало слова": lambda: rng.choice(vocabulary) + " " + rng.choice(vocabulary)[:2],
+    }
+    worst = 0
+    for name, make_query in cases.items():
+        timings = [timed(index.search, make_query(), 50)[0] for _ in range(args.queries)]
+        report(name, timings)
+        worst = max(worst, percentile(timings, 95))
+    print(f"Худший p95: {worst:.3f} мс ({'в пределах' if worst < 5 else 'больше'} 5 мс)")
+
+    fuzzy_cases = {
+        "опечатка": lambda: typo(rng, rng.choice(vocabulary)),
+        "две опечатки": lambda: typo(rng, rng.choice(vocabulary)) + " " + typo(rng, rng.choice(vocabulary)),
+        "другая раскладка": lambda: rng.choice(vocabulary).lower().translate(TO_LATIN_LAYOUT),
+    }
+    for name, make_query in fuzzy_cases.items():
+        timings = []
+        hits = 0
+        for _ in range(args.queries):
+            elapsed, result = timed(index.fuzzy_search, make_query(), 20)
+            timings.append(elapsed)
+            hits += bool(result)
+        report("нечеткий: " + name, timings)
+        print(f"{'':>28}  найдено для {hits * 100 // args.queries}% запросов")
+    print(f"Триграммный индекс: {len(index.word_index)} слов, "
+          f"{sum(len(p) for p in index.word_index.postings.values()) * 4 // 1024} КБ списков")
+
+    # Время построения индекса в приложении не должно доставаться первому запросу.
+    # Индекс замеров выше освобождается, чтобы сборка мусора не обходила и его
+    del index
+    gc.collect()
+    query = rng.choice(vocabulary)
+    load_ms, iterations, search_ms = cold_first_query(texts, query, True)
+    print(f"Первый запрос после загрузки: {search_ms:.3f} мс (loadNotes {load_ms:.0f} мс)")
+    print(f"{'':>28}  индекс построен за {len(iterations)} итераций цикла событий: "
+          f"p95 {percentile(iterations, 95):.1f} мс, max {max(iterations):.1f} мс")
+    load_ms, _, search_ms = cold_first_query(texts, query, False)
+    print(f"Первый запрос сразу после loadNotes (индекс достраивается в запросе): {search_ms:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
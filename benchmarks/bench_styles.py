@@ -0,0 +1,90 @@
+"""Бенчмарк создания окон заметок и смены их оформления
+
+Работает без окон (QT_QPA_PLATFORM=offscreen).
+
+Запуск: python benchmarks/bench_styles.py [--notes 500] [--repeat 3]
+"""
+import argparse
+import statistics
+import time
+
+from _common import qt_application
+
+from PyQt5.QtCore import QCoreApplication, QEvent
+
+import sticky_notes
+from note_styles import BACKGROUND_CACHE, STYLE_CACHE
+
+# Несколько типичных сочетаний оформления: заметки чаще всего их повторяют
+STYLES = [
+    {"color": "#FFFF99", "theme": "default"},
+    {"color": "#99CCFF", "theme": "default"},
+    {"color": "#FFCC99", "theme": "gradient", "gradient_direction": "vertical"},
+    {"color": "#CCFFCC", "theme": "gradient", "gradient_direction": "radial"},
+    {"color": "#FF99CC", "theme": "glass"},
+]
+
+
+def create_notes(count, show):
+    notes = []
+    for note_id in range(1, count + 1):
+        note = sticky_notes.ResizableStickyNote(note_id, f"Заметка {note_id}",
+                                                **STYLES[note_id % len(STYLES)])
+        if show:
+            note.show()
+        notes.append(note)
+    QCoreApplication.processEvents()
+    return notes
+
+
+def destroy_notes(notes):
+    for note in notes:
+        note.dispose()
+        note.hide()
+        note.deleteLater()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+
+def restyle(notes, theme):
+    for note in notes:
+        note.theme = theme
+        note.applyTheme()
+    QCoreApplication.processEvents()
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    qt_application()
+    results = {"создание": [], "создание и показ": [], "смена темы у всех": [],
+               "та же тема повторно": []}
+    for _ in range(args.repeat):
+        elapsed, notes = timed(create_notes, args.notes, False)
+        results["создание"].append(elapsed)
+        destroy_notes(notes)
+
+        elapsed, notes = timed(create_notes, args.notes, True)
+        results["создание и показ"].append(elapsed)
+        for theme in ("glass", "gradient", "default"):
+            results["смена темы у всех"].append(timed(restyle, notes, theme)[0])
+        results["та же тема повторно"].append(timed(restyle, notes, "default")[0])
+        destroy_notes(notes)
+
+    for name, timings in results.items():
+        print(f"{name:>20} ({args.notes} заметок): медиана {statistics.median(timings):.0f} мс, "
+              f"min {min(timings):.0f} мс")
+    print(f"Кэш стилей: {STYLE_CACHE.stats()}")
+    print(f"Кэш фонов: {BACKGROUND_CACHE.stats()}")
+
+
+if __name__ == "__main__":
+    main()
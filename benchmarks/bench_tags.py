@@ -0,0 +1,55 @@
+"""Бенчмарк переключения наборов заметок по тегам («работа» / «дом»)
+
+Работает без окон (QT_QPA_PLATFORM=offscreen) с базой во временной папке.
+
+Запуск: python benchmarks/bench_tags.py [--notes 1000] [--switches 20]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from _common import percentile, qt_application, isolate_settings, make_app, close_app
+
+from note_storage import normalize_record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--switches", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        isolate_settings(workdir)
+        qt_application()
+
+        app = make_app(workdir)
+        for note_id in range(1, args.notes + 1):
+            tag = "работа" if note_id % 2 else "дом"
+            app.records[note_id] = normalize_record({
+                "content": f"Заметка {note_id} #{tag}", "x": 10, "y": 10, "visible": tag == "работа",
+            })
+        app.saveNotes()
+        app.persistence.flush()
+        app.loadNotes()
+
+        timings = {"работа": [], "дом": []}
+        for i in range(args.switches):
+            tag = "дом" if i % 2 == 0 else "работа"
+            started = time.perf_counter()
+            app.showOnlyTaggedNotes(tag)
+            timings[tag].append((time.perf_counter() - started) * 1000)
+            app.persistence.flush()
+        for tag, values in timings.items():
+            print(f"Только #{tag} ({len(app.tag_index.notes(tag))} заметок): "
+                  f"p50 {statistics.median(values):.1f} мс, p95 {percentile(values, 95):.1f} мс")
+        print(f"Видимых окон: {len(app.visible_ids)}, создано окон: {len(app.notes)}")
+
+        for note in app.notes.values():
+            note.dispose()
+        close_app(app)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Бенчмарк отложенных вызовов: QTimer на каждую заметку и общее колесо таймеров
+
+Работает без окон (QT_QPA_PLATFORM=offscreen). Для каждой заметки
+таймер скрытия кнопки перезапускается несколько раз (как при движении
+курсора по заметкам) и затем срабатывает через 200–1000 мс. Замеряются
+время запуска и остановки таймеров, число живых Qt-таймеров и число
+событий таймера Qt до срабатывания всех вызовов.
+
+Запуск: python benchmarks/bench_timer_wheel.py [--notes 100 1000 5000]
+"""
+import argparse
+import random
+import time
+
+from _common import qt_application
+
+from PyQt5.QtCore import QCoreApplication, QTimer
+
+from note_timers import TimerWheel, WheelTimer
+
+RESTARTS = 5
+
+
+def wait_until(done, limit_sec=5.0):
+    deadline = time.monotonic() + limit_sec
+    while not done() and time.monotonic() < deadline:
+        QCoreApplication.processEvents()
+        time.sleep(0.001)
+
+
+def run_qtimers(delays):
+    fired = []
+    timers = []
+    for _ in delays:
+        timer = QTimer()
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: fired.append(1))
+        timers.append(timer)
+    started = time.perf_counter()
+    for _ in range(RESTARTS):
+        for timer, delay in zip(timers, delays):
+            timer.stop()
+            timer.start(delay)
+    schedule_ms = (time.perf_counter() - started) * 1000
+    wait_until(lambda: len(fired) == len(delays))
+    # Каждый QTimer срабатывает отдельным событием таймера
+    return schedule_ms, len(timers), len(fired)
+
+
+def run_wheel(delays):
+    wheel = TimerWheel()
+    fired = []
+    timers = [WheelTimer(lambda: fired.append(1), wheel=wheel) for _ in delays]
+    started = time.perf_counter()
+    for _ in range(RESTARTS):
+        for timer, delay in zip(timers, delays):
+            timer.stop()
+            timer.start(delay)
+    schedule_ms = (time.perf_counter() - started) * 1000
+    wait_until(lambda: len(fired) == len(delays))
+    stats = wheel.stats()
+    wheel.deleteLater()
+    return schedule_ms, 1, stats["wakeups"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    qt_application(widgets=False)
+    rng = random.Random(7)
+    for count in args.notes:
+        delays = [rng.randint(200, 1000) for _ in range(count)]
+        for name, run in (("QTimer на заметку", run_qtimers), ("колесо таймеров", run_wheel)):
+            schedule_ms, live_timers, wakeups = run(delays)
+            print(f"{count:>5} заметок, {name:<17}: {RESTARTS} перезапусков {schedule_ms:7.1f} мс, "
+                  f"Qt-таймеров {live_timers:>5}, событий таймера {wakeups:>5}")
+
+
+if __name__ == "__main__":
+    main()
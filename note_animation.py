@@ -0,0 +1,124 @@
+import time
+
+from PyQt5.QtCore import QObject, QTimer, QEasingCurve
+from PyQt5 import sip
+
+
+class PropertyFade:
+    """Плавное изменение одного числового свойства объекта (переиспользуется)"""
+
+    __slots__ = ("target", "name", "start_value", "end_value", "started", "duration", "easing")
+
+    def __init__(self, target, name):
+        self.target = target
+        self.name = name
+        self.start_value = 0.0
+        self.end_value = 0.0
+        self.started = 0.0
+        self.duration = 0.0
+        self.easing = None
+
+    def value_at(self, now):
+        progress = 1.0 if self.duration <= 0 else min(1.0, (now - self.started) / self.duration)
+        eased = self.easing.valueForProgress(progress)
+        return self.start_value + (self.end_value - self.start_value) * eased, progress >= 1.0
+
+
+class AnimationDriver(QObject):
+    """Общий для всех заметок двигатель плавных переходов
+
+    На каждую пару (объект, свойство) заводится одна запись, которая
+    переиспользуется. Новый переход для уже анимируемого свойства
+    продолжается с текущего значения, а не создает вторую анимацию.
+    Все активные переходы продвигаются одним таймером, который работает,
+    только пока есть активные переходы.
+    """
+
+    # Шаг кадра (около 60 кадров в секунду)
+    FRAME_MS = 16
+
+    _instance = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # {(id(target), name): PropertyFade}
+        self.fades = {}
+        self.active = {}
+        self.easing = QEasingCurve(QEasingCurve.InOutQuad)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.FRAME_MS)
+        self.timer.timeout.connect(self.tick)
+
+    @classmethod
+    def instance(cls):
+        """Двигатель анимаций приложения (создается при первом обращении)"""
+        if cls._instance is None:
+            cls._instance = AnimationDriver()
+        return cls._instance
+
+    def animate(self, target, name, end_value, duration_ms, easing=None):
+        """Плавно ведет свойство name объекта target к end_value за duration_ms
+
+        Если свойство уже анимируется, переход перенацеливается: начинается
+        с текущего значения, а длительность сокращается пропорционально
+        оставшемуся расстоянию.
+        """
+        key = (id(target), name)
+        fade = self.fades.get(key)
+        if fade is None or fade.target is not target:
+            fade = self.fades[key] = PropertyFade(target, name)
+        running = key in self.active
+        if running and fade.end_value == end_value:
+            return
+        current = float(target.property(name))
+        full_distance = abs(fade.end_value - fade.start_value) if running else 0.0
+        fade.start_value = current
+        fade.end_value = float(end_value)
+        fade.started = time.monotonic()
+        fade.duration = duration_ms / 1000
+        if full_distance:
+            fade.duration *= min(1.0, abs(end_value - current) / full_distance)
+        fade.easing = easing or self.easing
+        if current == fade.end_value:
+            self.active.pop(key, None)
+        else:
+            self.active[key] = fade
+            if not self.timer.isActive():
+                self.timer.start()
+
+    def setValue(self, target, name, value):
+        """Сразу задает значение, отменяя текущий переход"""
+        self.cancel(target, name)
+        target.setProperty(name, value)
+
+    def cancel(self, target, name):
+        """Останавливает переход на текущем значении"""
+        self.active.pop((id(target), name), None)
+
+    def forget(self, target, name):
+        """Удаляет запись перехода (перед удалением объекта)"""
+        key = (id(target), name)
+        self.active.pop(key, None)
+        self.fades.pop(key, None)
+
+    def isAnimating(self, target, name):
+        return (id(target), name) in self.active
+
+    def tick(self):
+        """Продвигает все активные переходы на один кадр"""
+        now = time.monotonic()
+        finished = []
+        for key, fade in self.active.items():
+            if sip.isdeleted(fade.target):
+                finished.append(key)
+                self.fades.pop(key, None)
+                continue
+            value, done = fade.value_at(now)
+            fade.target.setProperty(fade.name, value)
+            if done:
+                finished.append(key)
+        for key in finished:
+            self.active.pop(key, None)
+        if not self.active:
+            self.timer.stop()
@@ -0,0 +1,216 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS note_history (
+    note_id INTEGER NOT NULL,
+    revision INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (note_id, revision)
+);
+"""
+
+FULL = "full"
+DELTA = "delta"
+
+
+def make_delta(old, new):
+    """Строит разницу между текстами: [длина общего начала, длина общего конца, вставка]
+
+    Правка заметки почти всегда локальна (набор, удаление, вставка в одном
+    месте), поэтому достаточно отрезать общие начало и конец — это O(n)
+    и дает точное восстановление.
+    """
+    limit = min(len(old), len(new))
+    prefix = _common_length(lambda n: old[:n] == new[:n], limit)
+    suffix = _common_length(lambda n: old[len(old) - n:] == new[len(new) - n:], limit - prefix)
+    return [prefix, suffix, new[prefix:len(new) - suffix]]
+
+
+def _common_length(matches, limit):
+    """Бинарный поиск длины совпадения: сравнение срезов идет на скорости C"""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if matches(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def apply_delta(old, delta):
+    """Применяет разницу, построенную make_delta"""
+    prefix, suffix, inserted = delta
+    return old[:prefix] + inserted + old[len(old) - suffix:]
+
+
+class NoteHistory:
+    """История версий заметок: периодические полные снимки и сжатые разницы
+
+    Каждые snapshot_interval ревизий сохраняется полный текст, между ними —
+    только разницы. Все записи сжаты zlib. Восстановление ревизии читает
+    ближайший снимок и применяет разницы после него. Запись идет из потока
+    сохранения, чтение — из GUI-потока, поэтому обращения к соединению
+    выполняются под блокировкой.
+    """
+
+    DEFAULT_SNAPSHOT_INTERVAL = 50
+    DEFAULT_MAX_REVISIONS = 1000
+    DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, path, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL,
+                 max_revisions=DEFAULT_MAX_REVISIONS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.max_revisions = max(self.snapshot_interval, max_revisions)
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        # Последний текст и номер ревизии каждой заметки: {note_id: (revision, text, last_full)}
+        self.heads = {}
+        self.total_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM note_history").fetchone()[0]
+
+    def _head(self, note_id):
+        head = self.heads.get(note_id)
+        if head is None:
+            row = self.connection.execute(
+                "SELECT MAX(revision), MAX(CASE WHEN kind = ? THEN revision END) "
+                "FROM note_history WHERE note_id = ?", (FULL, note_id)).fetchone()
+            if row[0] is None:
+                head = (0, None, 0)
+            else:
+                head = (row[0], self.restore(note_id, row[0]), row[1] or 0)
+            self.heads[note_id] = head
+        return head
+
+    def record(self, note_id, text):
+        """Добавляет ревизию, если текст изменился. Возвращает номер ревизии или None"""
+        with self.lock:
+            note_id = int(note_id)
+            revision, last_text, last_full = self._head(note_id)
+            if text == last_text:
+                return None
+            revision += 1
+            if last_text is None or revision - last_full >= self.snapshot_interval:
+                kind, payload = FULL, text
+                last_full = revision
+            else:
+                kind, payload = DELTA, json.dumps(make_delta(last_text, text), ensure_ascii=False)
+            data = zlib.compress(payload.encode("utf-8"))
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO note_history (note_id, revision, kind, data, size, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (note_id, revision, kind, data, len(data), time.time()))
+            self.total_bytes += len(data)
+            self.heads[note_id] = (revision, text, last_full)
+            if kind == FULL and revision > self.max_revisions:
+                self._trim_note(note_id, revision)
+            if self.total_bytes > self.max_bytes:
+                self._trim_global()
+            return revision
+
+    def revisions(self, note_id):
+        """Список ревизий заметки: [(revision, created_at, size)], новые первыми"""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT revision, created_at, size FROM note_history WHERE note_id = ? "
+                "ORDER BY revision DESC", (int(note_id),)).fetchall()
+
+    def notes(self):
+        """Заметки, для которых есть история: [(note_id, revisions, last_change)]"""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT note_id, COUNT(*), MAX(created_at) FROM note_history "
+                "GROUP BY note_id ORDER BY MAX(created_at) DESC").fetchall()
+
+    def max_note_id(self):
+        """Наибольший номер заметки, для которой есть история"""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COALESCE(MAX(note_id), 0) FROM note_history").fetchone()[0]
+
+    def restore(self, note_id, revision):
+        """Восстанавливает текст заметки на указанной ревизии"""
+        with self.lock:
+            note_id = int(note_id)
+            start = self.connection.execute(
+                "SELECT MAX(revision) FROM note_history WHERE note_id = ? AND kind = ? AND revision <= ?",
+                (note_id, FULL, revision)).fetchone()[0]
+            if start is None:
+                return None
+            text = None
+            for kind, data in self.connection.execute(
+                    "SELECT kind, data FROM note_history WHERE note_id = ? AND revision BETWEEN ? AND ? "
+                    "ORDER BY revision", (note_id, start, revision)):
+                payload = zlib.decompress(data).decode("utf-8")
+                if kind == FULL:
+                    text = payload
+                else:
+                    text = apply_delta(text, json.loads(payload))
+            return text
+
+    def forget(self, note_id):
+        """Удаляет всю историю заметки"""
+        with self.lock:
+            note_id = int(note_id)
+            with self.connection:
+                self.connection.execute("DELETE FROM note_history WHERE note_id = ?", (note_id,))
+            self.heads.pop(note_id, None)
+            self.total_bytes = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM note_history").fetchone()[0]
+
+    def _delete_before(self, note_id, revision):
+        with self.connection:
+            freed = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM note_history WHERE note_id = ? AND revision < ?",
+                (note_id, revision)).fetchone()[0]
+            self.connection.execute(
+                "DELETE FROM note_history WHERE note_id = ? AND revision < ?", (note_id, revision))
+        self.total_bytes -= freed
+        return freed
+
+    def _trim_note(self, note_id, latest):
+        """Оставляет не меньше max_revisions последних ревизий, удаляя цепочки целиком"""
+        cutoff = self.connection.execute(
+            "SELECT MAX(revision) FROM note_history WHERE note_id = ? AND kind = ? AND revision <= ?",
+            (note_id, FULL, latest - self.max_revisions + 1)).fetchone()[0]
+        if cutoff:
+            self._delete_before(note_id, cutoff)
+
+    def _trim_global(self):
+        """Вытесняет самые старые цепочки ревизий, пока история не уложится в max_bytes"""
+        while self.total_bytes > self.max_bytes:
+            # Самый старый снимок, за которым у той же заметки есть более новый
+            row = self.connection.execute(
+                "SELECT h.note_id, MIN(n.revision) FROM note_history h "
+                "JOIN note_history n ON n.note_id = h.note_id AND n.kind = ? AND n.revision > h.revision "
+                "WHERE h.kind = ? GROUP BY h.note_id, h.revision "
+                "ORDER BY h.created_at LIMIT 1", (FULL, FULL)).fetchone()
+            if row is None:
+                break
+            self._delete_before(row[0], row[1])
+
+    def stats(self):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(kind = ?), 0), COUNT(DISTINCT note_id) FROM note_history",
+                (FULL,)).fetchone()
+            return {"revisions": row[0], "snapshots": row[1], "notes": row[2], "bytes": self.total_bytes}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
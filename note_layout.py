@@ -0,0 +1,342 @@
+from itertools import accumulate
+from operator import add, sub
+
+
+class OccupancyGrid:
+    """Сетка занятости одного экрана: число заметок, задевающих каждую клетку
+
+    Заметка отмечает все клетки, которых касается, поэтому блок свободных
+    клеток гарантированно не пересекается ни с одной заметкой.
+    """
+
+    def __init__(self, bounds, cell_size):
+        self.x, self.y, self.width, self.height = bounds
+        self.cell_size = cell_size
+        self.cols = max(1, self.width // cell_size)
+        self.rows = max(1, self.height // cell_size)
+        self.counts = [[0] * self.cols for _ in range(self.rows)]
+        self.occupied = 0
+        # Таблица сумм строится заново только после изменений
+        self.table = None
+
+    def cell_range(self, rect):
+        """Клетки, которых касается прямоугольник: (col0, row0, col1, row1) или None"""
+        x, y, width, height = rect
+        col0 = max(0, (x - self.x) // self.cell_size)
+        row0 = max(0, (y - self.y) // self.cell_size)
+        col1 = min(self.cols, -(-(x + width - self.x) // self.cell_size))
+        row1 = min(self.rows, -(-(y + height - self.y) // self.cell_size))
+        if col0 >= col1 or row0 >= row1:
+            return None
+        return col0, row0, col1, row1
+
+    def mark(self, rect, delta):
+        cells = self.cell_range(rect)
+        if cells is None:
+            return
+        col0, row0, col1, row1 = cells
+        self.table = None
+        for row in self.counts[row0:row1]:
+            for col in range(col0, col1):
+                if row[col] == 0:
+                    self.occupied += 1
+                row[col] += delta
+                if row[col] == 0:
+                    self.occupied -= 1
+
+    def summed_area(self):
+        """Таблица сумм занятых клеток: table[r][c] — число занятых в блоке [0, r) x [0, c)"""
+        if self.table is None:
+            table = [[0] * (self.cols + 1)]
+            previous = table[0]
+            for row in self.counts:
+                prefix = [0]
+                prefix.extend(accumulate(map(bool, row)))
+                previous = list(map(add, previous, prefix))
+                table.append(previous)
+            self.table = table
+        return self.table
+
+    def block_overlaps(self, row, block_cols, block_rows):
+        """Число занятых клеток в блоках block_cols x block_rows, начинающихся в строке row"""
+        top = self.table[row]
+        bottom = self.table[row + block_rows]
+        return list(map(sub, map(sub, bottom[block_cols:], bottom),
+                        map(sub, top[block_cols:], top)))
+
+
+class PlacementEngine:
+    """Поиск свободного места для новой заметки
+
+    Для каждого экрана хранится сетка занятости, которая обновляется по
+    одной заметке. Поиск по таблице сумм сетки экрана проверяет каждый
+    блок клеток за O(1) и идет от точки привязки (курсора) наружу. Если
+    свободного места нет, выбирается блок с наименьшим перекрытием.
+    """
+
+    DEFAULT_CELL_SIZE = 20
+    DEFAULT_GAP = 10
+
+    def __init__(self, screens=(), cell_size=DEFAULT_CELL_SIZE, gap=DEFAULT_GAP):
+        self.cell_size = cell_size
+        self.gap = gap
+        self.rects = {}
+        self.grids = []
+        self.set_screens(screens)
+
+    def set_screens(self, screens):
+        """Задает доступные области экранов [(x, y, width, height)] и перестраивает сетки"""
+        self.grids = [OccupancyGrid(tuple(screen), self.cell_size) for screen in screens]
+        for rect in self.rects.values():
+            self._mark(rect, 1)
+
+    def _mark(self, rect, delta):
+        for grid in self.grids:
+            grid.mark(rect, delta)
+
+    def update(self, note_id, rect):
+        """Добавляет или перемещает заметку: rect = (x, y, width, height)"""
+        rect = tuple(rect)
+        old = self.rects.get(note_id)
+        if old == rect:
+            return
+        if old is not None:
+            self._mark(old, -1)
+        self.rects[note_id] = rect
+        self._mark(rect, 1)
+
+    def remove(self, note_id):
+        rect = self.rects.pop(note_id, None)
+        if rect is not None:
+            self._mark(rect, -1)
+
+    def clear(self):
+        self.rects = {}
+        self.set_screens([(grid.x, grid.y, grid.width, grid.height) for grid in self.grids])
+
+    def rebuild(self, rects):
+        """Строит индекс заново по словарю {note_id: (x, y, width, height)}"""
+        self.rects = {note_id: tuple(rect) for note_id, rect in rects.items()}
+        self.set_screens([(grid.x, grid.y, grid.width, grid.height) for grid in self.grids])
+
+    def grid_at(self, x, y):
+        for grid in self.grids:
+            if grid.x <= x < grid.x + grid.width and grid.y <= y < grid.y + grid.height:
+                return grid
+        return self.grids[0] if self.grids else None
+
+    def find_place(self, width, height, anchor):
+        """Левый верхний угол свободного места для заметки размера width x height
+
+        Место ищется на экране точки anchor = (x, y) как можно ближе к ней.
+        Строки сетки перебираются по удалению от точки привязки; в каждой
+        строке перекрытия всех блоков считаются разом по таблице сумм,
+        а ближайший свободный блок находится через list.index.
+        """
+        grid = self.grid_at(*anchor)
+        if grid is None:
+            return anchor
+        size = grid.cell_size
+        block_cols = min(grid.cols, -(-(width + self.gap) // size))
+        block_rows = min(grid.rows, -(-(height + self.gap) // size))
+        max_col = grid.cols - block_cols
+        max_row = grid.rows - block_rows
+        # Клетка, с которой блок оказывается центрирован на точке привязки
+        anchor_col = min(max_col, max(0, (anchor[0] - grid.x - width // 2) // size))
+        anchor_row = min(max_row, max(0, (anchor[1] - grid.y - height // 2) // size))
+
+        grid.summed_area()
+        best = None
+        best_distance = None
+        fallback = None
+        for distance_row in range(max(anchor_row, max_row - anchor_row) + 1):
+            if best_distance is not None and distance_row * distance_row >= best_distance:
+                break
+            for row in {anchor_row - distance_row, anchor_row + distance_row}:
+                if row < 0 or row > max_row:
+                    continue
+                overlaps = grid.block_overlaps(row, block_cols, block_rows)
+                columns = []
+                try:
+                    columns.append(overlaps.index(0, anchor_col))
+                except ValueError:
+                    pass
+                try:
+                    columns.append(anchor_col - overlaps[anchor_col::-1].index(0))
+                except ValueError:
+                    pass
+                for col in columns:
+                    distance = (col - anchor_col) ** 2 + distance_row * distance_row
+                    if best_distance is None or distance < best_distance:
+                        best, best_distance = (col, row), distance
+                if best is None:
+                    # Свободного места пока нет: запоминаем блок с наименьшим перекрытием
+                    least = min(overlaps)
+                    if fallback is None or least < fallback[0]:
+                        fallback = (least, (overlaps.index(least), row))
+        col, row = best if best is not None else fallback[1]
+        # Отступ gap делится поровну между соседями
+        offset = self.gap // 2
+        return grid.x + col * size + offset, grid.y + row * size + offset
+
+
+# Упорядочивание всех заметок. Каждая раскладка получает заметки
+# [(note_id, width, height)] и экраны [(x, y, width, height)] и возвращает
+# {note_id: (x, y, width, height)} за один проход. Если заметки не
+# помещаются, следующий слой раскладывается заново со сдвигом.
+
+LAYER_SHIFT = 20
+
+
+def _screen_order(screens):
+    """Экраны слева направо и сверху вниз"""
+    return sorted(tuple(screen) for screen in screens)
+
+
+def _shifted(x, y, width, height, screen, layer):
+    """Сдвигает положение на слой, не выпуская заметку за экран"""
+    left, top, screen_width, screen_height = screen
+    shift = layer * LAYER_SHIFT
+    x = max(left, min(x + shift, left + screen_width - width))
+    y = max(top, min(y + shift, top + screen_height - height))
+    return x, y, width, height
+
+
+def grid_slots(screens, size, gap):
+    """Левые верхние углы ячеек size x size на всех экранах: [(x, y, screen)]"""
+    slots = []
+    for screen in _screen_order(screens):
+        left, top, width, height = screen
+        cols = (width - gap) // (size + gap)
+        rows = (height - gap) // (size + gap)
+        for row in range(rows):
+            for col in range(cols):
+                slots.append((left + gap + col * (size + gap), top + gap + row * (size + gap), screen))
+    return slots
+
+
+def tile_layout(notes, screens, gap=PlacementEngine.DEFAULT_GAP, max_size=300, min_size=150):
+    """Плитка: одинаковые квадратные заметки в сетке по всем экранам
+
+    Берется наибольший размер не больше max_size, при котором помещаются
+    все заметки, но не меньше min_size.
+    """
+    screens = _screen_order(screens)
+    size = max_size
+    while size > min_size and len(grid_slots(screens, size, gap)) < len(notes):
+        size -= 10
+    slots = grid_slots(screens, size, gap)
+    if not slots:
+        return {}
+    layout = {}
+    for index, (note_id, _, _) in enumerate(notes):
+        layer, slot = divmod(index, len(slots))
+        x, y, screen = slots[slot]
+        layout[note_id] = _shifted(x, y, size, size, screen, layer)
+    return layout
+
+
+def cascade_layout(notes, screens, gap=PlacementEngine.DEFAULT_GAP, step=30):
+    """Каскад: стопки заметок со сдвигом на step, у каждой виден заголовок
+
+    Заметка, которая не помещается в стопку по высоте, начинает новую
+    стопку правее, а стопка, не помещающаяся по ширине, — на следующем экране.
+    """
+    screens = _screen_order(screens)
+    if not screens:
+        return {}
+    layout = {}
+    screen_index = 0
+    layer = 0
+    left, top, width, height = screens[0]
+    stack_x = left + gap
+    stack_width = 0
+    depth = 0
+    for note_id, note_width, note_height in notes:
+        note_width = min(note_width, width - 2 * gap)
+        note_height = min(note_height, height - 2 * gap)
+        while True:
+            x = stack_x + depth * step
+            y = top + gap + depth * step
+            if depth and y + note_height > top + height - gap:
+                # Новая стопка правее
+                stack_x += stack_width + gap
+                stack_width = 0
+                depth = 0
+                continue
+            if stack_width and x + note_width > left + width - gap:
+                # Следующий экран (после последнего — новый слой с первого)
+                screen_index += 1
+                if screen_index == len(screens):
+                    screen_index = 0
+                    layer += 1
+                left, top, width, height = screens[screen_index]
+                note_width = min(note_width, width - 2 * gap)
+                note_height = min(note_height, height - 2 * gap)
+                stack_x = left + gap
+                stack_width = 0
+                depth = 0
+                continue
+            break
+        layout[note_id] = _shifted(x, y, note_width, note_height, screens[screen_index], layer)
+        stack_width = max(stack_width, x + note_width - stack_x)
+        depth += 1
+    return layout
+
+
+def pack_layout(notes, screens, gap=PlacementEngine.DEFAULT_GAP):
+    """Плотная упаковка по размеру: полки по убыванию высоты (first-fit)
+
+    Заметки сохраняют размер. Самые высокие открывают полки, остальные
+    встают в первую полку, где хватает места по ширине.
+    """
+    screens = _screen_order(screens)
+    if not screens:
+        return {}
+    order = sorted(notes, key=lambda note: (-note[2], -note[1], note[0]))
+    layout = {}
+    layer = 0
+    # Полки: [x следующей заметки, y, высота, экран]; для экрана — y следующей полки
+    shelves = []
+    next_shelf = {screen: screen[1] + gap for screen in screens}
+    for note_id, note_width, note_height in order:
+        while True:
+            place = None
+            for shelf in shelves:
+                x, y, shelf_height, screen = shelf
+                if note_height <= shelf_height and x + note_width <= screen[0] + screen[2] - gap:
+                    place = shelf
+                    break
+            if place is None:
+                for screen in screens:
+                    left, top, width, height = screen
+                    width_fits = note_width <= width - 2 * gap
+                    y = next_shelf[screen]
+                    if y + note_height <= top + height - gap and width_fits:
+                        place = [left + gap, y, note_height, screen]
+                        shelves.append(place)
+                        next_shelf[screen] = y + note_height + gap
+                        break
+            if place is not None:
+                break
+            if not shelves:
+                # Заметка больше любого экрана: уменьшаем до первого экрана
+                left, top, width, height = screens[0]
+                note_width = min(note_width, width - 2 * gap)
+                note_height = min(note_height, height - 2 * gap)
+                continue
+            # Все экраны заполнены: следующий слой
+            layer += 1
+            shelves = []
+            next_shelf = {screen: screen[1] + gap for screen in screens}
+        x, y, _, screen = place
+        layout[note_id] = _shifted(x, y, note_width, note_height, screen, layer)
+        place[0] = x + note_width + gap
+    return layout
+
+
+LAYOUTS = {
+    "grid": tile_layout,
+    "cascade": cascade_layout,
+    "pack": pack_layout,
+}
@@ -0,0 +1,170 @@
+import queue
+
+from PyQt5.QtCore import QObject, QThread, QTimer, QElapsedTimer, pyqtSignal
+
+
+class AutosaveScheduler(QObject):
+    """Отложенное автосохранение заметок (write-behind)
+
+    Изменения только помечают заметку как «грязную». Запись выполняется,
+    когда пользователь перестал печатать на idle_ms, но не позже чем через
+    max_delay_ms после первого несохраненного изменения.
+    """
+
+    DEFAULT_IDLE_MS = 500
+    DEFAULT_MAX_DELAY_MS = 3000
+
+    def __init__(self, flush_callback, idle_ms=DEFAULT_IDLE_MS,
+                 max_delay_ms=DEFAULT_MAX_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.flush_callback = flush_callback
+        self.idle_ms = max(0, int(idle_ms))
+        self.max_delay_ms = max(self.idle_ms, int(max_delay_ms))
+
+        self.dirty = set()
+        self.first_dirty = QElapsedTimer()
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.timeout.connect(self.flush)
+
+        self.max_timer = QTimer(self)
+        self.max_timer.setSingleShot(True)
+        self.max_timer.timeout.connect(self.flush)
+
+        # Статистика
+        self.marks = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.pending_marks = 0
+
+    def markDirty(self, note_id):
+        """Помечает заметку как измененную и откладывает запись"""
+        self.marks += 1
+        self.pending_marks += 1
+        if not self.dirty:
+            self.first_dirty.start()
+            self.max_timer.start(self.max_delay_ms)
+        self.dirty.add(note_id)
+        self.idle_timer.start(self.idle_ms)
+
+    def discard(self, note_id):
+        """Убирает заметку из очереди: она уже сохранена или удалена напрямую"""
+        if note_id not in self.dirty:
+            return
+        self.dirty.discard(note_id)
+        if not self.dirty:
+            self.idle_timer.stop()
+            self.max_timer.stop()
+            # Сам планировщик ничего не записал: изменения ушли в чужую запись или удалены
+            self.coalesced += self.pending_marks
+            self.pending_marks = 0
+
+    def hasPending(self):
+        return bool(self.dirty)
+
+    def flush(self):
+        """Немедленно сохраняет все накопленные изменения"""
+        self.idle_timer.stop()
+        self.max_timer.stop()
+        if not self.dirty:
+            return
+        dirty = self.dirty
+        self.dirty = set()
+        self.writes += 1
+        self.coalesced += self.pending_marks - 1
+        self.pending_marks = 0
+        self.flush_callback(dirty)
+
+    def stats(self):
+        """Возвращает статистику объединения записей"""
+        return {
+            "marks": self.marks,
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "pending": len(self.dirty),
+        }
+
+
+class PersistenceWorker(QThread):
+    """Поток записи заметок на диск
+
+    GUI-поток передает сюда неизменяемые снимки записей (копии словарей),
+    а сравнение с сохраненным состоянием, сериализация, запись журнала
+    и истории выполняются в этом потоке строго в порядке поступления.
+    """
+    error = pyqtSignal(str)
+
+    def __init__(self, journal, history=None):
+        super().__init__()
+        self.journal = journal
+        self.history = history
+        self.tasks = queue.Queue()
+
+    def save(self, records):
+        """Ставит в очередь сохранение снимков записей {note_id: record}"""
+        if records:
+            self.tasks.put(("save", {note_id: dict(record) for note_id, record in records.items()}))
+
+    def delete(self, note_ids):
+        """Ставит в очередь удаление заметок"""
+        if note_ids:
+            self.tasks.put(("delete", list(note_ids)))
+
+    def unload(self, note_ids):
+        """Ставит в очередь выгрузку состояния заметок из журнала (после их записи)"""
+        if note_ids:
+            self.tasks.put(("unload", list(note_ids)))
+
+    def flush(self):
+        """Дожидается записи всех поставленных в очередь изменений"""
+        if self.isRunning():
+            self.tasks.join()
+        else:
+            self.process_pending()
+
+    def stop(self):
+        """Записывает оставшееся и завершает поток"""
+        if self.isRunning():
+            self.tasks.put(None)
+            self.wait()
+        self.process_pending()
+
+    def process_pending(self):
+        """Выполняет задачи в текущем потоке (когда рабочий поток не запущен)"""
+        while True:
+            try:
+                task = self.tasks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if task is not None:
+                    self.process(*task)
+            finally:
+                self.tasks.task_done()
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                self.process(*task)
+            finally:
+                self.tasks.task_done()
+
+    def process(self, action, payload):
+        try:
+            if action == "save":
+                changes = self.journal.save(payload)
+                if self.history is not None:
+                    for note_id, changed in changes.items():
+                        if "content" in changed:
+                            self.history.record(note_id, changed["content"])
+            elif action == "delete":
+                self.journal.delete(payload)
+            elif action == "unload":
+                self.journal.unload(payload)
+        except Exception as e:
+            print(f"Ошибка сохранения заметок: {e}")
+            self.error.emit(str(e))
@@ -0,0 +1,74 @@
+from PyQt5.QtCore import QObject, QTimer
+
+
+class WidgetPool(QObject):
+    """Ограниченный пул готовых скрытых окон заметок
+
+    Окна закрытых и выгруженных заметок не удаляются, а возвращаются в пул
+    (не больше max_size) и затем привязываются к новой заметке. В простое
+    после запуска и после каждой выдачи пул заранее создает до spares окон,
+    по одному за раз, чтобы не задерживать обработку событий.
+    """
+
+    DEFAULT_MAX_SIZE = 4
+    DEFAULT_SPARES = 2
+    # Задержка подготовки запасных окон: после запуска и выдачи окна
+    WARM_UP_DELAY_MS = 1000
+
+    def __init__(self, factory, max_size=DEFAULT_MAX_SIZE, spares=DEFAULT_SPARES, parent=None):
+        super().__init__(parent)
+        self.factory = factory
+        self.max_size = max(0, int(max_size))
+        self.spares = min(self.max_size, max(0, int(spares)))
+        self.free = []
+
+        self.warm_timer = QTimer(self)
+        self.warm_timer.setSingleShot(True)
+        self.warm_timer.timeout.connect(self.warmUp)
+
+        # Статистика
+        self.created = 0
+        self.reused = 0
+        self.missed = 0
+
+    def __len__(self):
+        return len(self.free)
+
+    def acquire(self):
+        """Готовое окно из пула или None, если пул пуст"""
+        if not self.free:
+            self.missed += 1
+            return None
+        self.reused += 1
+        return self.free.pop()
+
+    def release(self, widget):
+        """Возвращает скрытое окно в пул; False, если пул полон и окно нужно удалить"""
+        if len(self.free) >= self.max_size:
+            return False
+        self.free.append(widget)
+        return True
+
+    def scheduleWarmUp(self, delay_ms=WARM_UP_DELAY_MS):
+        if len(self.free) < self.spares and not self.warm_timer.isActive():
+            self.warm_timer.start(delay_ms)
+
+    def warmUp(self):
+        """Создает одно запасное окно; следующее — на следующей итерации цикла событий"""
+        if len(self.free) >= self.spares:
+            return
+        self.free.append(self.factory())
+        self.created += 1
+        if len(self.free) < self.spares:
+            self.warm_timer.start(0)
+
+    def clear(self):
+        """Удаляет все окна пула"""
+        self.warm_timer.stop()
+        free, self.free = self.free, []
+        for widget in free:
+            widget.deleteLater()
+
+    def stats(self):
+        return {"free": len(self.free), "created": self.created,
+                "reused": self.reused, "missed": self.missed}
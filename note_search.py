@@ -0,0 +1,296 @@
+import re
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_token(token):
+    """Приводит слово к виду для поиска: без учета регистра, «ё» = «е»"""
+    return token.casefold().replace("ё", "е")
+
+
+def tokenize(text):
+    """Множество нормализованных слов текста"""
+    return {normalize_token(token) for token in TOKEN_RE.findall(text)}
+
+
+def first_line(text):
+    """Первая непустая строка текста (заголовок заметки)"""
+    return text.strip().split("\n", 1)[0]
+
+
+class InvertedIndex:
+    """Инвертированный индекс слов заметок
+
+    Хранит для каждого слова множество номеров заметок и отсортированный
+    словарь для поиска по началу слова (поиск по мере ввода). При изменении
+    заметки обновляются только добавленные и исчезнувшие слова. Словарь
+    дублируется в триграммном индексе для нечеткого поиска.
+    """
+
+    # Совпадение в первой строке (заголовке) заметки ценится выше
+    FIRST_LINE_BOOST = 1.5
+
+    def __init__(self):
+        self.postings = {}
+        self.note_tokens = {}
+        self.first_line_tokens = {}
+        self.texts = {}
+        self.vocabulary = []
+        self.word_index = TrigramIndex()
+
+    def __len__(self):
+        return len(self.note_tokens)
+
+    def rebuild(self, texts):
+        """Строит индекс заново по словарю {note_id: text}"""
+        self.postings = {}
+        self.note_tokens = {}
+        self.first_line_tokens = {}
+        self.texts = dict(texts)
+        for note_id, text in texts.items():
+            tokens = tokenize(text)
+            self.note_tokens[note_id] = tokens
+            self.first_line_tokens[note_id] = tokenize(first_line(text))
+            for token in tokens:
+                self.postings.setdefault(token, set()).add(note_id)
+        self.vocabulary = sorted(self.postings)
+        self.word_index = TrigramIndex()
+        for token in self.vocabulary:
+            self.word_index.add(token)
+
+    def update(self, note_id, text):
+        """Переиндексирует заметку"""
+        if self.texts.get(note_id) == text:
+            return
+        self.texts[note_id] = text
+        new_tokens = tokenize(text)
+        old_tokens = self.note_tokens.get(note_id, set())
+        for token in old_tokens - new_tokens:
+            self._remove_posting(token, note_id)
+        for token in new_tokens - old_tokens:
+            notes = self.postings.get(token)
+            if notes is None:
+                notes = self.postings[token] = set()
+                insort(self.vocabulary, token)
+                self.word_index.add(token)
+            notes.add(note_id)
+        self.note_tokens[note_id] = new_tokens
+        self.first_line_tokens[note_id] = tokenize(first_line(text))
+
+    def remove(self, note_id):
+        """Убирает заметку из индекса"""
+        self.texts.pop(note_id, None)
+        self.first_line_tokens.pop(note_id, None)
+        for token in self.note_tokens.pop(note_id, ()):
+            self._remove_posting(token, note_id)
+
+    def _remove_posting(self, token, note_id):
+        notes = self.postings.get(token)
+        if notes is None:
+            return
+        notes.discard(note_id)
+        if not notes:
+            del self.postings[token]
+            self.word_index.remove(token)
+            index = bisect_left(self.vocabulary, token)
+            if index < len(self.vocabulary) and self.vocabulary[index] == token:
+                del self.vocabulary[index]
+
+    def prefix_matches(self, prefix, enough=None):
+        """Заметки, в которых есть слово, начинающееся с prefix
+
+        Если задано enough, поиск останавливается, набрав столько заметок.
+        """
+        result = set()
+        index = bisect_left(self.vocabulary, prefix)
+        while index < len(self.vocabulary) and self.vocabulary[index].startswith(prefix):
+            result |= self.postings[self.vocabulary[index]]
+            if enough and len(result) >= enough:
+                break
+            index += 1
+        return result
+
+    def search(self, query, limit=None):
+        """Номера заметок, содержащих все слова запроса
+
+        Последнее слово запроса ищется по началу, остальные — целиком.
+        С limit возвращается не больше limit заметок (для короткого начала
+        слова — первые найденные, а не все совпадения).
+        """
+        tokens = [normalize_token(token) for token in TOKEN_RE.findall(query)]
+        if not tokens:
+            return []
+        *complete, last = tokens
+        candidates = None
+        # Начинаем с самых редких слов, чтобы пересечения были короче
+        for token in sorted(set(complete), key=lambda t: len(self.postings.get(t, ()))):
+            notes = self.postings.get(token)
+            if not notes:
+                return []
+            candidates = set(notes) if candidates is None else candidates & notes
+            if not candidates:
+                return []
+        if candidates is not None and len(candidates) < 64:
+            # Кандидатов мало: проверяем последнее слово по словам самих заметок
+            result = {note_id for note_id in candidates
+                      if any(token.startswith(last) for token in self.note_tokens[note_id])}
+        else:
+            matches = self.prefix_matches(last, limit if candidates is None else None)
+            result = matches if candidates is None else candidates & matches
+        result = sorted(result)
+        return result[:limit] if limit else result
+
+    def fuzzy_search(self, query, limit=20, similar_words=10):
+        """Нечеткий поиск с опечатками, неверной раскладкой и транслитерацией
+
+        Возвращает [(note_id, сходство)] по убыванию сходства. Каждое слово
+        запроса сопоставляется с похожими словами словаря по триграммам;
+        заметка должна содержать похожее слово для каждого слова запроса.
+        """
+        scores = {}
+        for variant in query_variants(query):
+            tokens = [normalize_token(token) for token in TOKEN_RE.findall(variant)]
+            if not tokens:
+                continue
+            variant_scores = None
+            for token in tokens:
+                token_scores = {}
+                for similarity, word in self.word_index.similar(token, similar_words):
+                    for note_id in self.postings.get(word, ()):
+                        if variant_scores is not None and note_id not in variant_scores:
+                            continue
+                        score = similarity
+                        if word in self.first_line_tokens.get(note_id, ()):
+                            score *= self.FIRST_LINE_BOOST
+                        if score > token_scores.get(note_id, 0):
+                            token_scores[note_id] = score
+                if variant_scores is None:
+                    variant_scores = token_scores
+                else:
+                    variant_scores = {note_id: variant_scores[note_id] + score
+                                      for note_id, score in token_scores.items()}
+                if not variant_scores:
+                    break
+            for note_id, score in (variant_scores or {}).items():
+                score /= len(tokens)
+                if score > scores.get(note_id, 0):
+                    scores[note_id] = score
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+# Раскладки клавиатуры: одна и та же клавиша в английской и русской раскладке
+LATIN_KEYS = "`qwertyuiop[]asdfghjkl;'zxcvbnm,./~QWERTYUIOP{}ASDFGHJKL:\"ZXCVBNM<>?"
+CYRILLIC_KEYS = "ёйцукенгшщзхъфывапролджэячсмитьбю.ЁЙЦУКЕНГШЩЗХЪФЫВАПРОЛДЖЭЯЧСМИТЬБЮ,"
+TO_CYRILLIC_LAYOUT = str.maketrans(LATIN_KEYS, CYRILLIC_KEYS)
+TO_LATIN_LAYOUT = str.maketrans(CYRILLIC_KEYS, LATIN_KEYS)
+
+# Транслитерация латиницей (privet -> привет); сначала более длинные сочетания
+TRANSLITERATION = [
+    ("shch", "щ"), ("sch", "щ"), ("yo", "ё"), ("zh", "ж"), ("kh", "х"), ("ts", "ц"),
+    ("ch", "ч"), ("sh", "ш"), ("yu", "ю"), ("ya", "я"), ("ye", "е"),
+    ("a", "а"), ("b", "б"), ("v", "в"), ("g", "г"), ("d", "д"), ("e", "е"), ("z", "з"),
+    ("i", "и"), ("j", "й"), ("y", "ы"), ("k", "к"), ("l", "л"), ("m", "м"), ("n", "н"),
+    ("o", "о"), ("p", "п"), ("r", "р"), ("s", "с"), ("t", "т"), ("u", "у"), ("f", "ф"),
+    ("h", "х"), ("c", "ц"), ("w", "в"), ("x", "кс"), ("q", "к"),
+]
+TRANSLITERATION_RE = re.compile("|".join(latin for latin, _ in TRANSLITERATION))
+TRANSLITERATION_MAP = dict(TRANSLITERATION)
+
+
+def transliterate(text):
+    """Переводит латинскую транслитерацию в кириллицу"""
+    return TRANSLITERATION_RE.sub(lambda match: TRANSLITERATION_MAP[match.group(0)], text.lower())
+
+
+def query_variants(query):
+    """Варианты запроса с учетом неверной раскладки и транслитерации"""
+    variants = [query]
+    for variant in (query.translate(TO_CYRILLIC_LAYOUT), query.translate(TO_LATIN_LAYOUT),
+                    transliterate(query)):
+        if variant not in variants:
+            variants.append(variant)
+    return variants
+
+
+def trigrams(word):
+    """Триграммы слова с границами: «кот» -> «  к», « ко», «кот», «от »"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Триграммный индекс слов для нечеткого поиска
+
+    Слова получают целые номера, списки слов по триграммам хранятся
+    в компактных массивах array('I'). Удаленное слово только помечается,
+    а списки перестраиваются, когда помеченных становится больше живых.
+    """
+
+    def __init__(self):
+        self.word_ids = {}
+        self.words = []
+        self.postings = {}
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.word_ids)
+
+    def add(self, word):
+        if word in self.word_ids:
+            return
+        word_id = len(self.words)
+        self.words.append(word)
+        self.word_ids[word] = word_id
+        for trigram in trigrams(word):
+            posting = self.postings.get(trigram)
+            if posting is None:
+                posting = self.postings[trigram] = array("I")
+            posting.append(word_id)
+
+    def remove(self, word):
+        word_id = self.word_ids.pop(word, None)
+        if word_id is None:
+            return
+        self.words[word_id] = None
+        self.dead += 1
+        if self.dead > len(self.word_ids):
+            self.compact()
+
+    def compact(self):
+        """Перестраивает списки без удаленных слов"""
+        words = list(self.word_ids)
+        self.word_ids = {}
+        self.words = []
+        self.postings = {}
+        self.dead = 0
+        for word in words:
+            self.add(word)
+
+    def similar(self, token, limit=20, threshold=0.3):
+        """Похожие слова: [(сходство, слово)] по убыванию сходства"""
+        query_trigrams = trigrams(token)
+        hits = Counter()
+        for trigram in query_trigrams:
+            posting = self.postings.get(trigram)
+            if posting:
+                hits.update(posting)
+        # Сходство Жаккара по множествам триграмм; у слова длины n их не больше n + 1
+        query_size = len(query_trigrams)
+        minimum_hits = threshold * query_size
+        result = []
+        for word_id, common in hits.items():
+            if common < minimum_hits:
+                continue
+            word = self.words[word_id]
+            if word is None:
+                continue
+            score = common / (query_size + len(word) + 1 - common)
+            if score >= threshold:
+                result.append((score, word))
+        result.sort(key=lambda item: (-item[0], item[1]))
+        return result[:limit]
@@ -0,0 +1,452 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+
+
+# Поля заметки и значения по умолчанию (в том же виде, что и в старом JSON)
+NOTE_DEFAULTS = {
+    "content": "",
+    "color": "#FFFF99",
+    "font_family": "Arial",
+    "font_size": 10,
+    "text_color": "#000000",
+    "x": None,
+    "y": None,
+    "width": 300,
+    "height": 300,
+    "always_on_top": True,
+    "pinned_to_screen": False,
+    "theme": "default",
+    "gradient_color1": None,
+    "gradient_color2": None,
+    "gradient_direction": "horizontal",
+    "visible": True,
+    "tags": "",
+    "workspace": "default",
+}
+
+BOOL_FIELDS = ("always_on_top", "pinned_to_screen", "visible")
+
+# Типы столбцов, добавленных после первой версии схемы (для обновления старых баз)
+ADDED_COLUMNS = {
+    "visible": "INTEGER",
+    "tags": "TEXT",
+    "workspace": "TEXT",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    content TEXT NOT NULL DEFAULT '',
+    color TEXT,
+    font_family TEXT,
+    font_size INTEGER,
+    text_color TEXT,
+    x INTEGER,
+    y INTEGER,
+    width INTEGER,
+    height INTEGER,
+    always_on_top INTEGER,
+    pinned_to_screen INTEGER,
+    theme TEXT,
+    gradient_color1 TEXT,
+    gradient_color2 TEXT,
+    gradient_direction TEXT,
+    visible INTEGER,
+    tags TEXT,
+    workspace TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def normalize_record(data):
+    """Приводит словарь с данными заметки к полному набору полей"""
+    record = dict(NOTE_DEFAULTS)
+    for field in NOTE_DEFAULTS:
+        value = data.get(field)
+        if value is not None:
+            record[field] = value
+    for field in BOOL_FIELDS:
+        value = record[field]
+        if isinstance(value, str):
+            value = value.lower() == "true"
+        record[field] = bool(value)
+    record["font_size"] = int(record["font_size"])
+    return record
+
+
+class NoteStore:
+    """Хранилище заметок в SQLite: одна строка на заметку"""
+
+    FIELDS = tuple(NOTE_DEFAULTS)
+
+    UPSERT_SQL = (
+        "INSERT INTO notes (id, {fields}, updated_at) VALUES (?, {marks}, ?) "
+        "ON CONFLICT(id) DO UPDATE SET {updates}, updated_at = excluded.updated_at"
+    ).format(
+        fields=", ".join(FIELDS),
+        marks=", ".join("?" for _ in FIELDS),
+        updates=", ".join(f"{field} = excluded.{field}" for field in FIELDS),
+    )
+    SELECT_SQL = "SELECT id, {fields} FROM notes".format(fields=", ".join(FIELDS))
+    DELETE_SQL = "DELETE FROM notes WHERE id = ?"
+
+    LEGACY_MIGRATED_KEY = "legacy_qsettings_migrated"
+    ACTIVE_WORKSPACE_KEY = "active_workspace"
+    WORKSPACES_KEY = "workspaces"
+
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.upgrade_schema()
+        self.connection.commit()
+
+    def upgrade_schema(self):
+        """Добавляет в таблицу notes столбцы, которых нет в старой базе"""
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(notes)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in columns:
+                self.connection.execute(f"ALTER TABLE notes ADD COLUMN {column} {column_type}")
+                if column == "workspace":
+                    # Старые заметки попадают в рабочий стол по умолчанию
+                    self.connection.execute("UPDATE notes SET workspace = ?",
+                                            (NOTE_DEFAULTS["workspace"],))
+        self.connection.execute("CREATE INDEX IF NOT EXISTS notes_workspace ON notes (workspace)")
+
+    def load_all(self, workspace=None):
+        """Читает заметки (все или одного рабочего стола): {note_id: record}"""
+        if workspace is None:
+            rows = self.connection.execute(self.SELECT_SQL + " ORDER BY id")
+        else:
+            rows = self.connection.execute(self.SELECT_SQL + " WHERE workspace = ? ORDER BY id",
+                                           (workspace,))
+        return self._read_rows(rows)
+
+    def load_ids(self, note_ids):
+        """Читает заметки с указанными номерами"""
+        note_ids = [int(note_id) for note_id in note_ids]
+        if not note_ids:
+            return {}
+        marks = ", ".join("?" for _ in note_ids)
+        return self._read_rows(self.connection.execute(
+            self.SELECT_SQL + f" WHERE id IN ({marks}) ORDER BY id", note_ids))
+
+    def _read_rows(self, rows):
+        notes = {}
+        for row in rows:
+            record = dict(zip(self.FIELDS, row[1:]))
+            notes[row[0]] = normalize_record(record)
+        return notes
+
+    def note_ids(self):
+        """Номера всех заметок в снимке (всех рабочих столов)"""
+        return {row[0] for row in self.connection.execute("SELECT id FROM notes")}
+
+    def max_note_id(self):
+        """Наибольший номер заметки в снимке"""
+        return self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM notes").fetchone()[0]
+
+    def save(self, records):
+        """Сохраняет (UPSERT) переданные заметки в одной транзакции"""
+        if records:
+            self.apply(records, ())
+
+    def delete(self, note_ids):
+        """Удаляет заметки"""
+        self.apply({}, note_ids)
+
+    def apply(self, records, deleted_ids):
+        """Сохраняет и удаляет заметки в одной транзакции"""
+        now = time.time()
+        rows = []
+        for note_id, data in records.items():
+            record = normalize_record(data)
+            values = [int(record[field]) if field in BOOL_FIELDS else record[field]
+                      for field in self.FIELDS]
+            rows.append((int(note_id), *values, now))
+        with self.connection:
+            if rows:
+                self.connection.executemany(self.UPSERT_SQL, rows)
+            if deleted_ids:
+                self.connection.executemany(self.DELETE_SQL,
+                                            [(int(note_id),) for note_id in deleted_ids])
+
+    def get_meta(self, key, default=None):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, str(value)))
+
+    def is_legacy_migrated(self):
+        return self.get_meta(self.LEGACY_MIGRATED_KEY) == "1"
+
+    def migrate_legacy(self, records):
+        """Однократный перенос заметок из старого хранилища QSettings"""
+        if self.is_legacy_migrated():
+            return False
+        # Не перезаписываем заметки, которые уже есть в базе
+        existing = self.note_ids()
+        self.save({note_id: data for note_id, data in records.items()
+                   if int(note_id) not in existing})
+        self.set_meta(self.LEGACY_MIGRATED_KEY, 1)
+        return True
+
+    def close(self):
+        self.connection.close()
+
+
+def read_journal(path):
+    """Читает операции из файла журнала, пропуская поврежденные строки"""
+    operations = []
+    if not os.path.exists(path):
+        return operations
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                operation = json.loads(line.decode("utf-8"))
+            except (UnicodeDecodeError, ValueError):
+                # Недописанная при сбое строка не должна ломать загрузку остальных
+                print(f"Пропущена поврежденная запись журнала в {path}")
+                continue
+            if isinstance(operation, dict) and "id" in operation:
+                operations.append(operation)
+    return operations
+
+
+def replay_journal(notes, operations):
+    """Применяет операции журнала к словарю заметок"""
+    for operation in operations:
+        note_id = int(operation["id"])
+        if operation.get("op") == "delete":
+            notes.pop(note_id, None)
+        else:
+            record = notes.setdefault(note_id, dict(NOTE_DEFAULTS))
+            record.update(operation.get("fields", {}))
+    return notes
+
+
+class NoteJournal:
+    """Журнал изменений заметок (append-only) поверх снимка в NoteStore
+
+    Каждое сохранение дописывает в журнал только изменившиеся поля.
+    fsync выполняется один раз на пакет записей. Когда журнал превышает
+    compact_bytes, он переименовывается и в фоне сворачивается в снимок
+    (таблицу notes), после чего удаляется. Операции содержат абсолютные
+    значения полей, поэтому повторное применение журнала безопасно.
+    """
+
+    DEFAULT_COMPACT_BYTES = 1024 * 1024
+
+    def __init__(self, store, path=None, compact_bytes=DEFAULT_COMPACT_BYTES):
+        self.store = store
+        self.path = path or os.path.splitext(store.path)[0] + ".journal"
+        self.compacting_path = self.path + ".compacting"
+        self.compact_bytes = compact_bytes
+        # Последнее сохраненное состояние загруженных заметок (для вычисления изменений)
+        self.state = {}
+        # Наибольший номер заметки среди всех рабочих столов
+        self.max_note_id = 0
+        self.file = None
+        self.size = 0
+        self.compaction_thread = None
+        self.appended = 0
+
+    def load(self, workspace=None):
+        """Загружает снимок и применяет к нему журнал
+
+        С workspace читаются только заметки этого рабочего стола; их состояние
+        добавляется к уже загруженному (см. unload).
+        """
+        # Фоновое сжатие переносит журнал в снимок: читаем после его окончания
+        self.wait()
+        operations = read_journal(self.compacting_path) + read_journal(self.path)
+        notes = self.store.load_all(workspace)
+        if workspace is not None:
+            # Журнал мог перенести заметку из другого рабочего стола: дочитываем ее из снимка
+            touched = {int(operation["id"]) for operation in operations}
+            notes.update(self.store.load_ids(touched - set(notes)))
+        replay_journal(notes, operations)
+        loaded = {}
+        for note_id, record in notes.items():
+            record = normalize_record(record)
+            if workspace is None or record["workspace"] == workspace:
+                loaded[note_id] = record
+        self.state.update(loaded)
+        self.max_note_id = max([self.max_note_id, self.store.max_note_id()] +
+                               [int(operation["id"]) for operation in operations])
+        if self.file is None:
+            self._open()
+            # Незавершенное сжатие (например, после сбоя) доводим до конца
+            if os.path.exists(self.compacting_path) or self.size >= self.compact_bytes:
+                self.compact()
+        return {note_id: dict(record) for note_id, record in loaded.items()}
+
+    def lookup(self, note_ids):
+        """Текущие записи заметок с любых рабочих столов: {note_id: record}
+
+        Удаленных заметок в результате нет. Состояние загруженных заметок
+        не меняется.
+        """
+        note_ids = {int(note_id) for note_id in note_ids}
+        if not note_ids:
+            return {}
+        self.wait()
+        operations = [operation for operation in
+                      read_journal(self.compacting_path) + read_journal(self.path)
+                      if int(operation["id"]) in note_ids]
+        notes = self.store.load_ids(note_ids)
+        replay_journal(notes, operations)
+        return {note_id: normalize_record(record) for note_id, record in notes.items()}
+
+    def unload(self, note_ids):
+        """Забывает состояние выгруженных заметок (их записи остаются на диске)"""
+        for note_id in note_ids:
+            self.state.pop(int(note_id), None)
+
+    def _open(self):
+        self.file = open(self.path, "ab")
+        self.size = self.file.tell()
+        if self.size and not self._ends_with_newline():
+            # Отделяем оборванную при сбое строку, чтобы не испортить следующую запись
+            self.file.write(b"\n")
+            self.size += 1
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def save(self, records):
+        """Дописывает в журнал изменения переданных заметок
+
+        Возвращает изменившиеся поля: {note_id: {field: value}}.
+        """
+        lines = []
+        changes = {}
+        saved = {}
+        for note_id, data in records.items():
+            note_id = int(note_id)
+            record = normalize_record(data)
+            previous = self.state.get(note_id)
+            if previous is None:
+                # Новая или выгруженная заметка записывается целиком
+                lines.append({"op": "create", "id": note_id, "fields": record})
+            else:
+                changed = {field: value for field, value in record.items()
+                           if previous.get(field) != value}
+                if not changed:
+                    continue
+                lines.append({"op": "update", "id": note_id, "fields": changed})
+            changes[note_id] = lines[-1]["fields"]
+            saved[note_id] = record
+        # Состояние меняется только после записи: при ошибке изменения будут записаны снова
+        self._append(lines)
+        self.state.update(saved)
+        if saved:
+            self.max_note_id = max(self.max_note_id, max(saved))
+        return changes
+
+    def delete(self, note_ids):
+        """Записывает в журнал удаление заметок"""
+        note_ids = [int(note_id) for note_id in note_ids if int(note_id) in self.state]
+        self._append([{"op": "delete", "id": note_id} for note_id in note_ids])
+        for note_id in note_ids:
+            self.state.pop(note_id, None)
+
+    def _append(self, lines):
+        if not lines:
+            return
+        if self.file is None or self.file.closed:
+            self._open()
+        data = b"".join(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n"
+                        for line in lines)
+        try:
+            self.file.write(data)
+            self.sync()
+        except OSError:
+            # Журнал откроется заново при следующей записи, недописанная строка будет отделена
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            self.file = None
+            raise
+        self.size += len(data)
+        self.appended += len(lines)
+        if self.size >= self.compact_bytes:
+            self.compact()
+
+    def sync(self):
+        """Сбрасывает журнал на диск (один fsync на пакет записей)"""
+        if self.file:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def compact(self, background=True):
+        """Сворачивает журнал в снимок"""
+        if self.compaction_thread and self.compaction_thread.is_alive():
+            return
+        if not os.path.exists(self.compacting_path):
+            if self.size == 0:
+                return
+            self.file.close()
+            try:
+                os.replace(self.path, self.compacting_path)
+            except OSError as e:
+                # Журнал занят (например, другим процессом в Windows): пишем дальше в него же
+                print(f"Ошибка сжатия журнала заметок: {e}")
+                self._open()
+                return
+            self._open()
+        if background:
+            self.compaction_thread = threading.Thread(target=self._compact_file,
+                                                      name="NoteJournalCompaction")
+            self.compaction_thread.start()
+        else:
+            self._compact_file()
+
+    def _compact_file(self):
+        try:
+            operations = read_journal(self.compacting_path)
+            # Отдельное соединение: sqlite3 не разделяет соединения между потоками
+            store = NoteStore(self.store.path)
+            try:
+                notes = store.load_all()
+                touched = {int(operation["id"]) for operation in operations}
+                replay_journal(notes, operations)
+                store.apply({note_id: notes[note_id] for note_id in touched if note_id in notes},
+                            [note_id for note_id in touched if note_id not in notes])
+            finally:
+                store.close()
+            os.remove(self.compacting_path)
+        except Exception as e:
+            print(f"Ошибка сжатия журнала заметок: {e}")
+
+    def wait(self):
+        """Дожидается окончания фонового сжатия"""
+        if self.compaction_thread:
+            self.compaction_thread.join()
+
+    def close(self):
+        self.wait()
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
@@ -0,0 +1,232 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import (QBrush, QColor, QGradient, QLinearGradient, QPainter, QPainterPath,
+                         QPen, QPixmap, QRadialGradient)
+
+
+class StyleCache:
+    """Кэш готовых таблиц стилей с вытеснением давно не использованных (LRU)
+
+    Заметки с одинаковым оформлением получают одну и ту же строку стиля,
+    а не собирают ее заново при каждом создании и изменении.
+    """
+
+    DEFAULT_MAX_SIZE = 128
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Возвращает стиль по ключу, строя его через build(*key) при промахе"""
+        style = self.entries.get(key)
+        if style is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return style
+        self.misses += 1
+        style = self.entries[key] = build(*key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return style
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+# Общий кэш стилей всех заметок
+STYLE_CACHE = StyleCache()
+
+GRADIENTS = {
+    "horizontal": "qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 {0}, stop:1 {1})",
+    "vertical": "qlineargradient(x1:0, y1:0, x2:0, y2:1, stop:0 {0}, stop:1 {1})",
+    "diagonal": "qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 {0}, stop:1 {1})",
+    "radial": "qradialgradient(cx:0.5, cy:0.5, radius:0.5, fx:0.5, fy:0.5, stop:0 {0}, stop:1 {1})",
+}
+
+
+def hex_to_rgba(hex_color, alpha=1.0):
+    """Конвертирует hex в rgba"""
+    hex_color = hex_color.lstrip('#')
+    r = int(hex_color[0:2], 16)
+    g = int(hex_color[2:4], 16)
+    b = int(hex_color[4:6], 16)
+    return f"rgba({r}, {g}, {b}, {alpha})"
+
+
+def background_key(theme, color, gradient_color1, gradient_color2, gradient_direction):
+    """Ключ оформления фона: только значения, от которых зависит его вид"""
+    if theme == "gradient":
+        return (theme, None, gradient_color1, gradient_color2, gradient_direction)
+    return (theme, color, None, None, None)
+
+
+def build_background_style(theme, color, gradient_color1, gradient_color2, gradient_direction):
+    if theme == "glass":
+        return f"""
+            QWidget {{
+                background-color: {hex_to_rgba(color, 0.8)};
+                border-radius: 8px;
+                border: 1px solid rgba(255, 255, 255, 0.3);
+            }}
+        """
+    if theme == "gradient":
+        # Неизвестное направление рисуется радиальным градиентом
+        gradient = GRADIENTS.get(gradient_direction, GRADIENTS["radial"])
+        return f"""
+            QWidget {{
+                background: {gradient.format(gradient_color1, gradient_color2)};
+                border-radius: 8px;
+                border: 1px solid rgba(100, 100, 100, 0.2);
+            }}
+        """
+    return f"""
+        QWidget {{
+            background-color: {color};
+            border-radius: 8px;
+            border: 1px solid rgba(100, 100, 100, 0.2);
+        }}
+    """
+
+
+def build_text_style(text_color, font_size, *background):
+    # Полосы прокрутки и область текста оформлены так же, как фон заметки
+    return build_background_style(*background) + f"""
+        QTextEdit {{
+            background: transparent;
+            border: none;
+            padding: 10px;
+            color: {text_color};
+            font-size: {font_size}px;
+        }}
+    """
+
+
+def text_style(text_color, font_size, background):
+    """Стиль текстового поля заметки; background — ключ из background_key"""
+    return STYLE_CACHE.get(("text", text_color, font_size) + background,
+                           lambda _, *key: build_text_style(*key))
+
+
+BORDER_RADIUS = 8
+
+# Концы линейного градиента в долях размера фона (как x1, y1, x2, y2 в QSS)
+GRADIENT_POINTS = {
+    "horizontal": (0, 0, 1, 0),
+    "vertical": (0, 0, 0, 1),
+    "diagonal": (0, 0, 1, 1),
+}
+
+
+def build_background_brush(theme, color, gradient_color1, gradient_color2, gradient_direction):
+    """Кисть фона и цвет рамки для темы"""
+    if theme == "glass":
+        fill = QColor(color)
+        fill.setAlphaF(0.8)
+        border = QColor(255, 255, 255)
+        border.setAlphaF(0.3)
+        return QBrush(fill), border
+    border = QColor(100, 100, 100)
+    border.setAlphaF(0.2)
+    if theme != "gradient":
+        return QBrush(QColor(color)), border
+    points = GRADIENT_POINTS.get(gradient_direction)
+    if points is None:
+        gradient = QRadialGradient(0.5, 0.5, 0.5, 0.5, 0.5)
+    else:
+        gradient = QLinearGradient(*points)
+    # Координаты в долях прямоугольника, как у qlineargradient/qradialgradient
+    gradient.setCoordinateMode(QGradient.ObjectBoundingMode)
+    gradient.setColorAt(0, QColor(gradient_color1))
+    gradient.setColorAt(1, QColor(gradient_color2))
+    return QBrush(gradient), border
+
+
+def draw_rounded_border(painter, rect, pen):
+    painter.setPen(pen)
+    painter.setBrush(Qt.NoBrush)
+    painter.drawRoundedRect(QRectF(rect).adjusted(0.5, 0.5, -0.5, -0.5), BORDER_RADIUS, BORDER_RADIUS)
+
+
+class BackgroundCache:
+    """Кисти и готовые картинки фона заметок
+
+    Кисти кэшируются по оформлению, картинки — по оформлению и размеру
+    (заметки обычно одного из нескольких стандартных размеров). Картинки
+    вытесняются по LRU при превышении числа или общего объема.
+    """
+
+    DEFAULT_MAX_PIXMAPS = 64
+    DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, max_pixmaps=DEFAULT_MAX_PIXMAPS, max_bytes=DEFAULT_MAX_BYTES):
+        self.brushes = StyleCache()
+        self.max_pixmaps = max_pixmaps
+        self.max_bytes = max_bytes
+        self.pixmaps = OrderedDict()
+        self.pixmap_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def brush(self, key):
+        return self.brushes.get(key, build_background_brush)
+
+    def paint(self, painter, key, width, height, header=None):
+        """Рисует фон без кэша картинок: закругленный прямоугольник с рамкой"""
+        brush, border = self.brush(key)
+        painter.setRenderHint(QPainter.Antialiasing)
+        # Как и в QSS, фон обрезан по середине крайних пикселей, рамка рисуется поверх
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(0.5, 0.5, width - 1, height - 1), BORDER_RADIUS - 1, BORDER_RADIUS - 1)
+        painter.fillPath(path, brush)
+        pen = QPen(border, 1)
+        draw_rounded_border(painter, QRectF(0, 0, width, height), pen)
+        if header is not None:
+            # Рамка верхней панели (раньше ее давал унаследованный панелью стиль фона)
+            draw_rounded_border(painter, header, pen)
+
+    def pixmap(self, key, width, height, ratio=1.0, header=None):
+        """Готовая картинка фона заданного размера"""
+        header_key = None if header is None else (header.x(), header.y(), header.width(), header.height())
+        cache_key = (key, width, height, ratio, header_key)
+        pixmap = self.pixmaps.get(cache_key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(cache_key)
+            self.hits += 1
+            return pixmap
+        self.misses += 1
+        pixmap = QPixmap(max(1, round(width * ratio)), max(1, round(height * ratio)))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        self.paint(painter, key, width, height, header)
+        painter.end()
+        self.pixmaps[cache_key] = pixmap
+        self.pixmap_bytes += self._size(pixmap)
+        while self.pixmaps and (len(self.pixmaps) > self.max_pixmaps or self.pixmap_bytes > self.max_bytes):
+            _, evicted = self.pixmaps.popitem(last=False)
+            self.pixmap_bytes -= self._size(evicted)
+        return pixmap
+
+    @staticmethod
+    def _size(pixmap):
+        return pixmap.width() * pixmap.height() * 4
+
+    def clear(self):
+        self.brushes.clear()
+        self.pixmaps.clear()
+        self.pixmap_bytes = 0
+
+    def stats(self):
+        return {"brushes": len(self.brushes.entries), "pixmaps": len(self.pixmaps),
+                "pixmap_bytes": self.pixmap_bytes, "hits": self.hits, "misses": self.misses}
+
+
+# Общий кэш фонов всех заметок
+BACKGROUND_CACHE = BackgroundCache()
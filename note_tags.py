@@ -0,0 +1,84 @@
+import re
+
+
+# Хэштег в тексте: #работа, #home, #проект-2 (но не часть слова или адреса)
+HASHTAG_RE = re.compile(r"(?<![\w#])#(\w[\w-]*)", re.UNICODE)
+
+
+def normalize_tag(tag):
+    """Приводит тег к единому виду: без «#», пробелов и учета регистра"""
+    return tag.strip().lstrip("#").strip().casefold()
+
+
+def parse_hashtags(text):
+    """Теги из #хэштегов текста"""
+    return {normalize_tag(tag) for tag in HASHTAG_RE.findall(text)}
+
+
+def parse_tag_list(text):
+    """Теги из строки, разделенной запятыми или пробелами"""
+    return {tag for tag in (normalize_tag(part) for part in re.split(r"[,\s]+", text)) if tag}
+
+
+def format_tag_list(tags):
+    """Строка тегов для хранения в записи заметки"""
+    return ", ".join(sorted(tags))
+
+
+def record_tags(record):
+    """Все теги заметки: назначенные явно и #хэштеги из текста"""
+    return parse_tag_list(record.get("tags") or "") | parse_hashtags(record.get("content") or "")
+
+
+class TagIndex:
+    """Индекс тег -> номера заметок
+
+    Обновляется по одной заметке при сохранении, поэтому выбор заметок
+    по тегу не требует обхода всех записей и окон.
+    """
+
+    def __init__(self):
+        self.notes_by_tag = {}
+        self.note_tags = {}
+
+    def rebuild(self, records):
+        """Строит индекс заново по словарю {note_id: record}"""
+        self.notes_by_tag = {}
+        self.note_tags = {}
+        for note_id, record in records.items():
+            self.update(note_id, record)
+
+    def update(self, note_id, record):
+        """Переиндексирует теги заметки"""
+        new_tags = record_tags(record)
+        old_tags = self.note_tags.get(note_id, set())
+        if new_tags == old_tags:
+            return
+        for tag in old_tags - new_tags:
+            self._remove_posting(tag, note_id)
+        for tag in new_tags - old_tags:
+            self.notes_by_tag.setdefault(tag, set()).add(note_id)
+        if new_tags:
+            self.note_tags[note_id] = new_tags
+        else:
+            self.note_tags.pop(note_id, None)
+
+    def remove(self, note_id):
+        """Убирает заметку из индекса"""
+        for tag in self.note_tags.pop(note_id, ()):
+            self._remove_posting(tag, note_id)
+
+    def _remove_posting(self, tag, note_id):
+        notes = self.notes_by_tag.get(tag)
+        if notes is not None:
+            notes.discard(note_id)
+            if not notes:
+                del self.notes_by_tag[tag]
+
+    def notes(self, tag):
+        """Номера заметок с тегом"""
+        return set(self.notes_by_tag.get(normalize_tag(tag), ()))
+
+    def tags(self):
+        """Все теги с числом заметок: [(tag, count)] по алфавиту"""
+        return [(tag, len(notes)) for tag, notes in sorted(self.notes_by_tag.items())]
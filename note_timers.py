@@ -0,0 +1,188 @@
+import sys
+import time
+from collections import deque
+
+from PyQt5.QtCore import Qt, QObject, QTimer
+from PyQt5 import sip
+
+
+def is_orphaned(callback):
+    """True, если callback — метод уже удаленного Qt-объекта"""
+    owner = getattr(callback, "__self__", None)
+    return isinstance(owner, sip.simplewrapper) and sip.isdeleted(owner)
+
+
+class WheelEntry:
+    """Запланированный вызов: номер такта срабатывания и ячейка колеса"""
+
+    __slots__ = ("tick", "callback", "slot")
+
+    def __init__(self, tick, callback, slot):
+        self.tick = tick
+        self.callback = callback
+        self.slot = slot
+
+
+class TimerWheel(QObject):
+    """Общий планировщик отложенных вызовов на хешированном колесе таймеров
+
+    Срок вызова переводится в номер такта (RESOLUTION_MS), вызов кладется
+    в ячейку колеса номер такта % WHEEL_SIZE. Добавление и отмена — O(1).
+    Под колесом один однократный QTimer, который взводится на ближайший
+    срок, поэтому без запланированных вызовов приложение не просыпается.
+    При пробуждении все наступившие вызовы выполняются одной пачкой.
+    """
+
+    RESOLUTION_MS = 10
+    WHEEL_SIZE = 512
+    # Окно, по которому считается частота пробуждений
+    RATE_WINDOW_SEC = 10
+
+    _instance = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.slots = [set() for _ in range(self.WHEEL_SIZE)]
+        self.active = 0
+        # Последний обработанный такт и такт, на который взведен таймер
+        self.current = self.now_tick()
+        self.armed_tick = None
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        # Точный таймер: при раннем пробуждении пришлось бы просыпаться еще раз
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.advance)
+
+        # Статистика
+        self.wakeups = 0
+        self.fired = 0
+        self.recent_wakeups = deque()
+
+    @classmethod
+    def instance(cls):
+        """Колесо таймеров приложения (создается при первом обращении)"""
+        if cls._instance is None:
+            cls._instance = TimerWheel()
+        return cls._instance
+
+    @classmethod
+    def now_tick(cls):
+        return int(time.monotonic() * 1000) // cls.RESOLUTION_MS
+
+    def schedule(self, delay_ms, callback):
+        """Планирует callback через delay_ms; возвращает запись для отмены"""
+        # Срок округляется вверх: вызов не срабатывает раньше задержки и не попадает в обработанный такт
+        deadline_ms = int(time.monotonic() * 1000) + max(0, int(delay_ms))
+        tick = max(self.current + 1, -(-deadline_ms // self.RESOLUTION_MS))
+        slot = self.slots[tick % self.WHEEL_SIZE]
+        entry = WheelEntry(tick, callback, slot)
+        slot.add(entry)
+        self.active += 1
+        if self.armed_tick is None or tick < self.armed_tick:
+            self.arm(tick)
+        return entry
+
+    def cancel(self, entry):
+        """Отменяет запланированный вызов; повторная отмена ничего не делает"""
+        if entry is not None and entry.slot is not None:
+            entry.slot.discard(entry)
+            entry.slot = None
+            self.active -= 1
+
+    def singleShot(self, delay_ms, callback):
+        """Однократный вызов, как QTimer.singleShot"""
+        return self.schedule(delay_ms, callback)
+
+    def arm(self, tick):
+        self.armed_tick = tick
+        delay = tick * self.RESOLUTION_MS - int(time.monotonic() * 1000)
+        self.timer.start(max(0, delay))
+
+    def advance(self):
+        """Выполняет все наступившие вызовы и взводит таймер на следующий срок"""
+        self.armed_tick = None
+        now = self.now_tick()
+        self.wakeups += 1
+        self.recent_wakeups.append(time.monotonic())
+
+        expired = []
+        # После долгого сна (например, спящего режима) колесо обходится один раз
+        for tick in range(max(self.current, now - self.WHEEL_SIZE) + 1, now + 1):
+            slot = self.slots[tick % self.WHEEL_SIZE]
+            if slot:
+                due = [entry for entry in slot if entry.tick <= now]
+                for entry in due:
+                    slot.discard(entry)
+                    entry.slot = None
+                expired.extend(due)
+        self.current = max(self.current, now)
+        self.active -= len(expired)
+        self.fired += len(expired)
+
+        expired.sort(key=lambda entry: entry.tick)
+        for entry in expired:
+            # Как и у QTimer.singleShot, вызов для удаленного объекта пропускается
+            if is_orphaned(entry.callback):
+                continue
+            try:
+                entry.callback()
+            except Exception:
+                sys.excepthook(*sys.exc_info())
+
+        next_tick = self.nextTick()
+        if next_tick is not None and (self.armed_tick is None or next_tick < self.armed_tick):
+            self.arm(next_tick)
+
+    def nextTick(self):
+        """Ближайший срок среди запланированных вызовов или None"""
+        if not self.active:
+            return None
+        for offset in range(1, self.WHEEL_SIZE + 1):
+            tick = self.current + offset
+            slot = self.slots[tick % self.WHEEL_SIZE]
+            if slot and any(entry.tick == tick for entry in slot):
+                return tick
+        # Все вызовы дальше одного оборота колеса
+        return min(entry.tick for slot in self.slots for entry in slot)
+
+    def stats(self):
+        """Число запланированных вызовов и частота пробуждений таймера"""
+        horizon = time.monotonic() - self.RATE_WINDOW_SEC
+        while self.recent_wakeups and self.recent_wakeups[0] < horizon:
+            self.recent_wakeups.popleft()
+        return {"active": self.active, "wakeups": self.wakeups, "fired": self.fired,
+                "wakeups_per_sec": len(self.recent_wakeups) / self.RATE_WINDOW_SEC}
+
+
+class WheelTimer:
+    """Перезапускаемый однократный таймер на общем колесе (вместо QTimer)
+
+    Повторяет нужную заметкам часть интерфейса QTimer: start, stop, isActive.
+    """
+
+    __slots__ = ("callback", "interval", "entry", "wheel")
+
+    def __init__(self, callback, interval_ms=0, wheel=None):
+        self.callback = callback
+        self.interval = interval_ms
+        self.entry = None
+        self.wheel = wheel or TimerWheel.instance()
+
+    def start(self, interval_ms=None):
+        if interval_ms is not None:
+            self.interval = interval_ms
+        self.wheel.cancel(self.entry)
+        self.entry = self.wheel.schedule(self.interval, self.fire)
+
+    def stop(self):
+        self.wheel.cancel(self.entry)
+        self.entry = None
+
+    def isActive(self):
+        return self.entry is not None and self.entry.slot is not None
+
+    def fire(self):
+        self.entry = None
+        if not is_orphaned(self.callback):
+            self.callback()
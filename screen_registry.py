@@ -0,0 +1,117 @@
+from bisect import bisect_right
+
+from PyQt5.QtCore import QObject, QPoint, QTimer, pyqtSignal
+from PyQt5.QtGui import QGuiApplication
+
+
+class ScreenRegistry(QObject):
+    """Общий для всех заметок список экранов
+
+    Геометрия экранов перечитывается только по сигналам об их изменении.
+    Поиск экрана по точке — двоичный поиск по вертикальным полосам между
+    границами экранов и затем по экранам внутри полосы. Для размещения
+    заметок используется доступная область экрана (без панели задач).
+    """
+
+    # Набор или геометрия экранов изменились
+    changed = pyqtSignal()
+
+    _instance = None
+
+    def __init__(self, app=None):
+        super().__init__()
+        self.app = app or QGuiApplication.instance()
+        # [(geometry, available_geometry)]
+        self.screens = []
+        self.xs = []
+        self.slabs = []
+
+        # Несколько сигналов подряд (например, при отключении монитора) дают одно обновление
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+        self.app.screenAdded.connect(self.onScreenAdded)
+        self.app.screenRemoved.connect(self.scheduleRefresh)
+        for screen in self.app.screens():
+            self.watchScreen(screen)
+        self.rebuild()
+
+    @classmethod
+    def instance(cls):
+        """Реестр экранов приложения (создается при первом обращении)"""
+        if cls._instance is None:
+            cls._instance = ScreenRegistry()
+        return cls._instance
+
+    def watchScreen(self, screen):
+        screen.geometryChanged.connect(self.scheduleRefresh)
+        screen.availableGeometryChanged.connect(self.scheduleRefresh)
+
+    def onScreenAdded(self, screen):
+        self.watchScreen(screen)
+        self.scheduleRefresh()
+
+    def scheduleRefresh(self, *args):
+        self.refresh_timer.start(0)
+
+    def refresh(self):
+        """Перечитывает экраны и сообщает об изменении"""
+        self.rebuild()
+        self.changed.emit()
+
+    def rebuild(self):
+        self.screens = [(screen.geometry(), screen.availableGeometry())
+                        for screen in self.app.screens()]
+        # Вертикальные полосы между всеми левыми и правыми границами экранов
+        self.xs = sorted({rect.left() for rect, _ in self.screens} |
+                         {rect.left() + rect.width() for rect, _ in self.screens})
+        self.slabs = []
+        for left in self.xs[:-1]:
+            slab = sorted((rect.top(), rect.top() + rect.height(), available)
+                          for rect, available in self.screens
+                          if rect.left() <= left < rect.left() + rect.width())
+            self.slabs.append(([top for top, _, _ in slab], slab))
+
+    def availableAt(self, x, y):
+        """Доступная область экрана, которому принадлежит точка, или None"""
+        index = bisect_right(self.xs, x) - 1
+        if index < 0 or index >= len(self.slabs):
+            return None
+        tops, slab = self.slabs[index]
+        position = bisect_right(tops, y) - 1
+        if position < 0:
+            return None
+        top, bottom, available = slab[position]
+        return available if y < bottom else None
+
+    def nearest(self, x, y):
+        """Доступная область ближайшего к точке экрана"""
+        best = None
+        best_distance = None
+        for rect, available in self.screens:
+            dx = max(rect.left() - x, 0, x - rect.right())
+            dy = max(rect.top() - y, 0, y - rect.bottom())
+            distance = dx * dx + dy * dy
+            if best_distance is None or distance < best_distance:
+                best, best_distance = available, distance
+        return best
+
+    def availableFor(self, geometry):
+        """Доступная область экрана под центром geometry (или ближайшего экрана)"""
+        center = geometry.center()
+        return self.availableAt(center.x(), center.y()) or self.nearest(center.x(), center.y())
+
+    def contains(self, point):
+        return self.availableAt(point.x(), point.y()) is not None
+
+    def clamp(self, geometry, margin=0):
+        """Положение geometry, сдвинутое внутрь доступной области ее экрана"""
+        available = self.availableFor(geometry)
+        if available is None:
+            return QPoint(geometry.x(), geometry.y())
+        left = available.left() + margin
+        top = available.top() + margin
+        right = available.left() + available.width() - margin - geometry.width()
+        bottom = available.top() + available.height() - margin - geometry.height()
+        return QPoint(max(left, min(geometry.x(), right)), max(top, min(geometry.y(), bottom)))
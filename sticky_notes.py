@@ -1,20 +1,38 @@
 import sys
 import json
 import os
+import re
 from PyQt5.QtWidgets import (QApplication, QWidget, QTextEdit, QVBoxLayout, 
                              QPushButton, QHBoxLayout, QSystemTrayIcon, 
                              QMenu, QAction, QColorDialog, QFontDialog,
                              QCheckBox, QDialog, QLabel, QDialogButtonBox,
                              QVBoxLayout as QVBoxLayout2, QMessageBox, QFrame,
                              QGraphicsDropShadowEffect, QSlider, QGroupBox,
-                             QTabWidget, QGridLayout)
-from PyQt5.QtCore import Qt, QPoint, QSettings, QRect, QTimer, QPropertyAnimation, QEasingCurve
-from PyQt5.QtGui import QIcon, QFont, QColor, QPixmap, QPainter
+                             QTabWidget, QGridLayout, QListWidget, QListWidgetItem,
+                             QSplitter, QLineEdit, QInputDialog, QGraphicsObject,
+                             QGraphicsTextItem, QGraphicsScene, QGraphicsView,
+                             QGraphicsOpacityEffect)
+from PyQt5.QtCore import (Qt, QPoint, QSettings, QRect, QPropertyAnimation, QEasingCurve,
+                          QStandardPaths, QParallelAnimationGroup, QRectF, QSize, QObject,
+                          pyqtProperty)
+from PyQt5.QtGui import QIcon, QFont, QColor, QPixmap, QPainter, QCursor, QPen, QRegion
 import requests
 import webbrowser
 from update_manager import UpdateManager
+from note_persistence import AutosaveScheduler, PersistenceWorker
+from note_storage import NoteStore, NoteJournal, NOTE_DEFAULTS
+from note_history import NoteHistory
+from note_search import InvertedIndex
+from note_tags import TagIndex, parse_tag_list, format_tag_list
+from note_styles import BACKGROUND_CACHE, background_key, text_style
+from screen_registry import ScreenRegistry
+from note_pool import WidgetPool
+from note_animation import AnimationDriver
+from note_timers import TimerWheel, WheelTimer
+from note_layout import PlacementEngine, LAYOUTS
 from packaging import version
 from datetime import datetime
+import time
 
 # Настройка High DPI должна быть ДО создания QApplication
 if hasattr(Qt, 'AA_EnableHighDpiScaling'):
@@ -41,6 +59,13 @@ def get_icon_path():
     
     return None
 
+def get_database_path():
+    """Получает путь к базе данных заметок"""
+    data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    if not data_dir:
+        data_dir = os.path.join(os.path.expanduser("~"), ".sticky_notes")
+    return os.path.join(data_dir, "notes.db")
+
 class UpdateDialog(QDialog):
     """Диалоговое окно обновления"""
     def __init__(self, update_info, current_version, parent=None):
@@ -489,6 +514,235 @@ class FontTextColorDialog(QDialog):
                 }}
             """)
 
+class NoteHistoryDialog(QDialog):
+    """Диалог просмотра и восстановления прошлых версий заметок"""
+    def __init__(self, history, note_titles, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.note_titles = note_titles
+        self.restored_note_id = None
+        self.restored_text = None
+        
+        self.setWindowTitle("История заметок")
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.resize(760, 460)
+        
+        self.initUI()
+        
+    def initUI(self):
+        layout = QVBoxLayout2(self)
+        
+        splitter = QSplitter(Qt.Horizontal)
+        
+        # Заметки, для которых есть история
+        self.notes_list = QListWidget()
+        for note_id, revisions, last_change in self.history.notes():
+            title = self.note_titles.get(note_id)
+            if title is None:
+                title = f"Заметка {note_id} (закрыта)"
+            item = QListWidgetItem(f"{title} — версий: {revisions}")
+            item.setData(Qt.UserRole, note_id)
+            self.notes_list.addItem(item)
+        self.notes_list.currentItemChanged.connect(self.onNoteSelected)
+        splitter.addWidget(self.notes_list)
+        
+        # Версии выбранной заметки
+        self.revisions_list = QListWidget()
+        self.revisions_list.currentItemChanged.connect(self.onRevisionSelected)
+        splitter.addWidget(self.revisions_list)
+        
+        # Текст выбранной версии
+        self.preview = QTextEdit()
+        self.preview.setReadOnly(True)
+        splitter.addWidget(self.preview)
+        splitter.setSizes([220, 180, 360])
+        
+        layout.addWidget(splitter)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        self.restore_btn = QPushButton("Восстановить эту версию")
+        self.restore_btn.setEnabled(False)
+        self.restore_btn.clicked.connect(self.restoreClicked)
+        button_box.addButton(self.restore_btn, QDialogButtonBox.AcceptRole)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+        
+        if self.notes_list.count():
+            self.notes_list.setCurrentRow(0)
+        
+    def onNoteSelected(self, item, previous=None):
+        """Показывает версии выбранной заметки"""
+        self.revisions_list.clear()
+        self.preview.clear()
+        self.restore_btn.setEnabled(False)
+        if item is None:
+            return
+        note_id = item.data(Qt.UserRole)
+        for revision, created_at, size in self.history.revisions(note_id):
+            timestamp = datetime.fromtimestamp(created_at).strftime("%d.%m.%Y %H:%M:%S")
+            revision_item = QListWidgetItem(f"#{revision}  {timestamp}")
+            revision_item.setData(Qt.UserRole, revision)
+            self.revisions_list.addItem(revision_item)
+            
+    def onRevisionSelected(self, item, previous=None):
+        """Показывает текст выбранной версии"""
+        if item is None:
+            self.preview.clear()
+            self.restore_btn.setEnabled(False)
+            return
+        note_id = self.notes_list.currentItem().data(Qt.UserRole)
+        self.preview.setPlainText(self.history.restore(note_id, item.data(Qt.UserRole)) or "")
+        self.restore_btn.setEnabled(True)
+        
+    def restoreClicked(self):
+        self.restored_note_id = self.notes_list.currentItem().data(Qt.UserRole)
+        self.restored_text = self.preview.toPlainText()
+        self.accept()
+
+class NoteSearchPopup(QWidget):
+    """Всплывающее окно поиска по заметкам (поиск по мере ввода)"""
+    MAX_RESULTS = 50
+    # Нечеткий поиск подключается, когда точных совпадений меньше
+    FUZZY_BELOW = 5
+    
+    def __init__(self, app):
+        super().__init__()
+        self.notes_app = app
+        self.setWindowTitle("Поиск заметок")
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool | Qt.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setStyleSheet("""
+            QWidget#searchFrame {
+                background-color: rgba(255, 255, 255, 0.97);
+                border: 1px solid #CCCCCC;
+                border-radius: 8px;
+            }
+        """)
+        self.setFixedWidth(360)
+        
+        self.initUI()
+        
+    def initUI(self):
+        frame = QFrame(self)
+        frame.setObjectName("searchFrame")
+        
+        shadow = QGraphicsDropShadowEffect()
+        shadow.setBlurRadius(15)
+        shadow.setColor(QColor(0, 0, 0, 100))
+        shadow.setOffset(0, 0)
+        frame.setGraphicsEffect(shadow)
+        
+        layout = QVBoxLayout(frame)
+        layout.setSpacing(5)
+        layout.setContentsMargins(10, 10, 10, 10)
+        
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Поиск по заметкам…")
+        self.query_edit.setStyleSheet("""
+            QLineEdit {
+                border: 1px solid #CCCCCC;
+                border-radius: 6px;
+                padding: 6px;
+                font-size: 13px;
+            }
+        """)
+        self.query_edit.textChanged.connect(self.onQueryChanged)
+        self.query_edit.returnPressed.connect(self.openCurrent)
+        layout.addWidget(self.query_edit)
+        
+        self.results_list = QListWidget()
+        self.results_list.setStyleSheet("QListWidget { border: none; }")
+        self.results_list.currentItemChanged.connect(self.onCurrentChanged)
+        self.results_list.itemActivated.connect(lambda item: self.openCurrent())
+        layout.addWidget(self.results_list)
+        
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #666666;")
+        layout.addWidget(self.status_label)
+        
+        window_layout = QVBoxLayout(self)
+        window_layout.setContentsMargins(10, 10, 10, 10)
+        window_layout.addWidget(frame)
+        self.resize(360, 380)
+        
+    def popup(self):
+        """Показывает окно поиска в центре текущего экрана"""
+        screen = QApplication.screenAt(QCursor.pos()) or QApplication.primaryScreen()
+        geometry = screen.availableGeometry()
+        self.move(geometry.center().x() - self.width() // 2, geometry.top() + geometry.height() // 4)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+        
+    def onQueryChanged(self, query):
+        """Обновляет список найденных заметок"""
+        self.results_list.clear()
+        if not query.strip():
+            self.status_label.setText("")
+            return
+        note_ids = self.notes_app.searchNotes(query, self.MAX_RESULTS)
+        for note_id in note_ids:
+            item = QListWidgetItem(self.notes_app.noteTitle(note_id))
+            item.setData(Qt.UserRole, note_id)
+            self.results_list.addItem(item)
+        # Точных совпадений мало — добавляем похожие (опечатки, раскладка, транслит)
+        similar_ids = []
+        if len(note_ids) < self.FUZZY_BELOW:
+            found = set(note_ids)
+            similar_ids = [note_id for note_id in self.notes_app.fuzzySearchNotes(query, self.MAX_RESULTS)
+                           if note_id not in found][:self.MAX_RESULTS - len(note_ids)]
+            for note_id in similar_ids:
+                item = QListWidgetItem("≈ " + self.notes_app.noteTitle(note_id))
+                item.setData(Qt.UserRole, note_id)
+                item.setForeground(QColor("#666666"))
+                self.results_list.addItem(item)
+        if note_ids or similar_ids:
+            status = f"Найдено: {len(note_ids)}"
+            if similar_ids:
+                status += f", похожих: {len(similar_ids)}"
+            self.status_label.setText(status)
+        else:
+            self.status_label.setText("Ничего не найдено")
+        if note_ids or similar_ids:
+            self.results_list.setCurrentRow(0)
+            
+    def onCurrentChanged(self, item, previous=None):
+        """Поднимает выбранную заметку поверх остальных окон
+        
+        Скрытая заметка только просматривается: она остается скрытой, пока
+        ее не откроют (Enter или двойной щелчок).
+        """
+        if item is not None:
+            self.notes_app.previewNote(item.data(Qt.UserRole))
+            self.raise_()
+            
+    def openCurrent(self):
+        """Переходит к выбранной заметке и закрывает поиск"""
+        item = self.results_list.currentItem()
+        if item is None:
+            return
+        note_id = item.data(Qt.UserRole)
+        # Открытая заметка показывается уже не для просмотра
+        self.notes_app.showNote(note_id)
+        self.hide()
+        self.notes_app.raiseNote(note_id, focus=True)
+        
+    def hideEvent(self, event):
+        self.notes_app.endPreview()
+        super().hideEvent(event)
+        
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.hide()
+        elif event.key() in (Qt.Key_Down, Qt.Key_Up) and self.query_edit.hasFocus():
+            row = self.results_list.currentRow() + (1 if event.key() == Qt.Key_Down else -1)
+            if 0 <= row < self.results_list.count():
+                self.results_list.setCurrentRow(row)
+        else:
+            super().keyPressEvent(event)
+
 class SettingsPopup(QWidget):
     """Всплывающее окно с настройками"""
     def __init__(self, parent=None):
@@ -592,6 +846,42 @@ class SettingsPopup(QWidget):
         self.theme_btn.clicked.connect(self.parent_note.changeTheme)
         layout.addWidget(self.theme_btn)
         
+        # Кнопка "Теги"
+        self.tags_btn = QPushButton("🏷 Теги")
+        self.tags_btn.setFixedHeight(32)
+        self.tags_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #666666;
+                color: white;
+                border-radius: 6px;
+                text-align: left;
+                padding-left: 10px;
+            }
+            QPushButton:hover {
+                background-color: #888888;
+            }
+        """)
+        self.tags_btn.clicked.connect(self.parent_note.editTags)
+        layout.addWidget(self.tags_btn)
+        
+        # Кнопка "Рабочий стол"
+        self.workspace_btn = QPushButton("🗂 Рабочий стол")
+        self.workspace_btn.setFixedHeight(32)
+        self.workspace_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #666666;
+                color: white;
+                border-radius: 6px;
+                text-align: left;
+                padding-left: 10px;
+            }
+            QPushButton:hover {
+                background-color: #888888;
+            }
+        """)
+        self.workspace_btn.clicked.connect(self.parent_note.moveToWorkspace)
+        layout.addWidget(self.workspace_btn)
+        
         # Овальный переключатель "Поверх всех окон"
         top_toggle_widget = QWidget()
         top_toggle_layout = QHBoxLayout(top_toggle_widget)
@@ -686,37 +976,410 @@ class SettingsPopup(QWidget):
         self.parent_note.updateWindowFlagsSilent()
         self.parent_note.saveSettings()
 
-class ResizableStickyNote(QWidget):
-    def __init__(self, note_id=1, content="", color="#FFFF99", font_family="Arial", 
-                 font_size=10, text_color="#000000", size=(300, 300), 
-                 always_on_top=True, pinned_to_screen=False, theme="default",
-                 gradient_color1=None, gradient_color2=None, gradient_direction="horizontal"):
-        super().__init__()
+class NoteBackground(QWidget):
+    """Фон заметки: закругленный прямоугольник, который рисуется сам, без QSS"""
+    def __init__(self, parent, style_key):
+        super().__init__(parent)
+        self.style_key = style_key
+        self.header = None
+        # Заметка выделена для группового изменения (Ctrl+клик)
+        self.selected = False
+        
+    def setSelected(self, selected):
+        if selected != self.selected:
+            self.selected = selected
+            self.update()
+        
+    def setStyleKey(self, style_key):
+        """Меняет оформление; перерисовка только если оно действительно изменилось"""
+        if style_key != self.style_key:
+            self.style_key = style_key
+            self.update()
+        
+    def paintEvent(self, event):
+        header = self.header.geometry() if self.header is not None else None
+        pixmap = BACKGROUND_CACHE.pixmap(self.style_key, self.width(), self.height(),
+                                         self.devicePixelRatioF(), header)
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, pixmap)
+        if self.selected:
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QPen(QColor("#3399FF"), 3))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRoundedRect(QRectF(self.rect()).adjusted(1.5, 1.5, -1.5, -1.5), 8, 8)
+        painter.end()
+        
+class NoteBehavior:
+    """Данные и поведение заметки, общие для окна (ResizableStickyNote) и элемента сцены
+
+    Класс-примесь: заметке нужны geometry(), setGeometry(), move(), resize(),
+    minimumWidth(), minimumHeight(), text_edit, applyTheme() и dialogParent().
+    """
+    # Поля записи, от которых зависит оформление
+    STYLE_FIELDS = ("color", "font_family", "font_size", "text_color", "theme",
+                    "gradient_color1", "gradient_color2", "gradient_direction")
+    # Свойство Qt, через которое анимируется геометрия заметки
+    GEOMETRY_PROPERTY = b"geometry"
+    
+    def assignFields(self, note_id=1, color="#FFFF99", font_family="Arial", font_size=10,
+                     text_color="#000000", size=(300, 300), always_on_top=True,
+                     pinned_to_screen=False, theme="default", gradient_color1=None,
+                     gradient_color2=None, gradient_direction="horizontal", position=None, tags=""):
+        """Запоминает параметры заметки (без применения к окну)"""
         self.note_id = note_id
         self.color = color
         self.font_family = font_family
         self.font_size = font_size
         self.text_color = text_color
         self.init_width, self.init_height = size
+        self.init_position = position
         self.always_on_top = always_on_top
         self.pinned_to_screen = pinned_to_screen
         self.theme = theme
         self.gradient_color1 = gradient_color1 or color
         self.gradient_color2 = gradient_color2 or self.lighten_color(color, 20)
         self.gradient_direction = gradient_direction
+        # Теги, назначенные явно (теги из #хэштегов берутся из текста)
+        self.tags = tags
+        
+    def initialPosition(self):
+        """Положение окна при создании: сохраненное или каскадом по номеру заметки"""
+        if self.init_position is not None:
+            return self.init_position
+        return 100 + (self.note_id - 1) * 20, 100 + (self.note_id - 1) * 20
+        
+    def backgroundKey(self):
+        """Ключ оформления фона для общих кэшей стилей и кистей"""
+        return background_key(self.theme, self.color, self.gradient_color1,
+                              self.gradient_color2, self.gradient_direction)
+        
+    def lighten_color(self, hex_color, percent):
+        """Осветляет цвет на заданный процент"""
+        hex_color = hex_color.lstrip('#')
+        r = min(255, int(int(hex_color[0:2], 16) * (1 + percent/100)))
+        g = min(255, int(int(hex_color[2:4], 16) * (1 + percent/100)))
+        b = min(255, int(int(hex_color[4:6], 16) * (1 + percent/100)))
+        return f"#{r:02x}{g:02x}{b:02x}"
+        
+    def applyStyleFields(self, fields):
+        """Меняет поля оформления и применяет стили один раз"""
+        for field, value in fields.items():
+            setattr(self, field, value)
+        if "font_family" in fields or "font_size" in fields:
+            self.text_edit.setFont(QFont(self.font_family, self.font_size))
+        self.applyTheme()
+        
+    def applyFields(self, fields):
+        """Применяет к окну измененные поля записи: оформление, флаги окна, размер, прикрепление"""
+        style = {field: value for field, value in fields.items() if field in self.STYLE_FIELDS}
+        if style:
+            self.applyStyleFields(style)
+        if "always_on_top" in fields and fields["always_on_top"] != self.always_on_top:
+            self.always_on_top = fields["always_on_top"]
+            self.updateWindowFlagsSilent()
+        if "width" in fields or "height" in fields:
+            geometry = self.geometry()
+            width = fields["width"] if "width" in fields else geometry.width()
+            height = fields["height"] if "height" in fields else geometry.height()
+            self.resize(width, height)
+        if "pinned_to_screen" in fields:
+            self.pinned_to_screen = fields["pinned_to_screen"]
+            if self.pinned_to_screen:
+                self.pinToCurrentScreen()
+        
+    def applyStyleChange(self, fields):
+        """Меняет оформление заметки, а если она выделена — всех выделенных заметок"""
+        if hasattr(self, 'main_window'):
+            self.main_window.updateNotes(self.main_window.selectedWith(self.note_id), **fields)
+        else:
+            self.applyStyleFields(fields)
+        
+    def openColorGradientDialog(self):
+        """Открывает диалог для выбора цвета или градиента"""
+        self.closeSettingsPopup()
+        
+        dialog = ColorGradientDialog(self.color, self.gradient_color1, self.gradient_color2,
+                                     self.dialogParent())
+        if dialog.exec_() == QDialog.Accepted:
+            if dialog.result_type == "solid":
+                fields = {"color": dialog.result_color, "theme": "default"}
+            else:
+                fields = {"gradient_color1": dialog.result_gradient1,
+                          "gradient_color2": dialog.result_gradient2, "theme": "gradient"}
+            self.applyStyleChange(fields)
+        
+    def openFontTextColorDialog(self):
+        """Открывает диалог для выбора шрифта и цвета текста"""
+        self.closeSettingsPopup()
+        
+        dialog = FontTextColorDialog(self.font_family, self.font_size, self.text_color, self.dialogParent())
+        if dialog.exec_() == QDialog.Accepted:
+            self.applyStyleChange({"font_family": dialog.font_family, "font_size": dialog.font_size,
+                                   "text_color": dialog.text_color})
+        
+    def changeTheme(self):
+        """Меняет тему заметки"""
+        themes = ["default", "gradient", "glass"]
+        current_index = themes.index(self.theme) if self.theme in themes else 0
+        next_theme = themes[(current_index + 1) % len(themes)]
+        self.applyStyleChange({"theme": next_theme})
+        self.closeSettingsPopup()
+        
+    def editTags(self):
+        """Открывает диалог для назначения тегов заметке"""
+        self.closeSettingsPopup()
+        
+        text, ok = QInputDialog.getText(self.dialogParent(), "Теги заметки",
+                                        "Теги через запятую (#хэштеги в тексте добавляются сами):",
+                                        QLineEdit.Normal, self.tags)
+        if ok:
+            self.tags = format_tag_list(parse_tag_list(text))
+            self.saveSettings()
+        
+    def moveToWorkspace(self):
+        """Переносит заметку на другой рабочий стол (можно ввести новое имя)"""
+        self.closeSettingsPopup()
+        if not hasattr(self, 'main_window'):
+            return
+        
+        app = self.main_window
+        titles = [app.workspaceTitle(name) for name in app.workspaceNames()]
+        current = titles.index(app.workspaceTitle(app.workspace))
+        title, ok = QInputDialog.getItem(self.dialogParent(), "Рабочий стол",
+                                         "Перенести заметку на рабочий стол:",
+                                         titles, current, True)
+        if ok and title.strip():
+            app.moveNoteToWorkspace(self.note_id, app.workspaceName(title.strip()))
+        
+    def getCurrentScreen(self, geometry=None):
+        """Доступная область экрана, на котором находится центр стикера (или геометрии geometry)"""
+        return ScreenRegistry.instance().availableFor(geometry if geometry is not None else self.geometry())
+        
+    def clampToScreen(self, geom):
+        """Положение geom, сдвинутое внутрь экрана, на котором ее центр"""
+        return ScreenRegistry.instance().clamp(geom, margin=5)
+        
+    def clampResizeToScreen(self, geom):
+        """Не дает краям прикрепленного стикера выйти за экран при изменении размера"""
+        screen = self.getCurrentScreen(self.resize_start_geometry)
+        if screen is None:
+            return geom
+            
+        bounds = screen.adjusted(5, 5, -5, -5)
+        if geom.left() < bounds.left():
+            geom.setLeft(bounds.left())
+        if geom.top() < bounds.top():
+            geom.setTop(bounds.top())
+        if geom.right() > bounds.right():
+            geom.setRight(bounds.right())
+        if geom.bottom() > bounds.bottom():
+            geom.setBottom(bounds.bottom())
+        return geom
+        
+    def pinToCurrentScreen(self):
+        """Прикрепляем стикер к текущему экрану"""
+        geometry = self.geometry()
+        position = self.clampToScreen(geometry)
+        if position != geometry.topLeft():
+            self.move(position)
+        
+    def pressGesture(self, x, y, global_pos, modifiers):
+        """Начало жеста мышью в точке (x, y) заметки: выделение, перетаскивание или изменение размера"""
+        # Ctrl+клик выделяет заметку для группового изменения, обычный клик снимает выделение
+        if hasattr(self, 'main_window'):
+            if modifiers & Qt.ControlModifier:
+                self.main_window.toggleNoteSelection(self.note_id)
+                return
+            self.main_window.clearSelection()
+        
+        geometry = self.geometry()
+        border_size = 10
+        
+        if x <= border_size:
+            if y <= border_size:
+                self.resize_direction = 'top-left'
+            elif y >= geometry.height() - border_size:
+                self.resize_direction = 'bottom-left'
+            else:
+                self.resize_direction = 'left'
+        elif x >= geometry.width() - border_size:
+            if y <= border_size:
+                self.resize_direction = 'top-right'
+            elif y >= geometry.height() - border_size:
+                self.resize_direction = 'bottom-right'
+            else:
+                self.resize_direction = 'right'
+        elif y <= border_size:
+            self.resize_direction = 'top'
+        elif y >= geometry.height() - border_size:
+            self.resize_direction = 'bottom'
+        else:
+            self.dragging = True
+            self.old_pos = global_pos
+            return
+        
+        self.resizing = True
+        self.resize_start_pos = global_pos
+        self.resize_start_geometry = geometry
+        
+    def moveGesture(self, global_pos):
+        if self.dragging and self.old_pos:
+            delta = QPoint(global_pos - self.old_pos)
+            geometry = self.geometry()
+            position = geometry.topLeft() + delta
+            if self.pinned_to_screen:
+                # Прикрепленный стикер не выходит за край экрана уже во время перетаскивания
+                position = self.clampToScreen(QRect(position, geometry.size()))
+            self.move(position)
+            self.old_pos = global_pos
+            self.markGeometryDirty()
+            
+        elif self.resizing and self.resize_start_pos and self.resize_start_geometry:
+            delta = global_pos - self.resize_start_pos
+            new_geometry = QRect(self.resize_start_geometry)
+            
+            if 'left' in self.resize_direction:
+                new_geometry.setLeft(new_geometry.left() + delta.x())
+                if new_geometry.width() < self.minimumWidth():
+                    new_geometry.setLeft(new_geometry.right() - self.minimumWidth())
+                    
+            if 'right' in self.resize_direction:
+                new_geometry.setRight(new_geometry.right() + delta.x())
+                if new_geometry.width() < self.minimumWidth():
+                    new_geometry.setRight(new_geometry.left() + self.minimumWidth())
+                    
+            if 'top' in self.resize_direction:
+                new_geometry.setTop(new_geometry.top() + delta.y())
+                if new_geometry.height() < self.minimumHeight():
+                    new_geometry.setTop(new_geometry.bottom() - self.minimumHeight())
+                    
+            if 'bottom' in self.resize_direction:
+                new_geometry.setBottom(new_geometry.bottom() + delta.y())
+                if new_geometry.height() < self.minimumHeight():
+                    new_geometry.setBottom(new_geometry.top() + self.minimumHeight())
+            
+            if self.pinned_to_screen:
+                new_geometry = self.clampResizeToScreen(new_geometry)
+            self.setGeometry(new_geometry)
+            self.markGeometryDirty()
+        
+    def releaseGesture(self):
+        self.dragging = False
+        self.resizing = False
+        self.resize_direction = None
+        self.old_pos = None
+        self.resize_start_pos = None
+        self.resize_start_geometry = None
+        if self.geometry_dirty:
+            self.geometry_dirty = False
+            self.saveSettings()
+        
+    def markGeometryDirty(self):
+        """Откладывает сохранение геометрии до конца жеста (или до срабатывания автосохранения)"""
+        self.geometry_dirty = True
+        if hasattr(self, 'main_window'):
+            self.main_window.scheduleSave(self.note_id)
+        
+    def createNewNote(self):
+        if hasattr(self, 'main_window'):
+            self.main_window.createNewNote()
+        self.closeSettingsPopup()
+        
+    def closeNote(self):
+        if hasattr(self, 'main_window'):
+            self.main_window.closeNote(self.note_id)
+        else:
+            self.close()
+        
+    def saveNote(self):
+        if hasattr(self, 'main_window'):
+            self.main_window.scheduleSave(self.note_id)
+        
+    def toRecord(self):
+        """Возвращает данные заметки для сохранения"""
+        geometry = self.geometry()
+        return {
+            "content": self.text_edit.toPlainText(),
+            "color": self.color,
+            "font_family": self.font_family,
+            "font_size": self.font_size,
+            "text_color": self.text_color,
+            "x": geometry.x(),
+            "y": geometry.y(),
+            "width": geometry.width(),
+            "height": geometry.height(),
+            "always_on_top": self.always_on_top,
+            "pinned_to_screen": self.pinned_to_screen,
+            "theme": self.theme,
+            "gradient_color1": self.gradient_color1,
+            "gradient_color2": self.gradient_color2,
+            "gradient_direction": self.gradient_direction,
+            "tags": self.tags
+        }
+        
+    def saveSettings(self):
+        """Сохраняет все настройки заметки одной записью"""
+        if hasattr(self, 'main_window'):
+            self.main_window.saveNotes([self.note_id])
+
+class ResizableStickyNote(NoteBehavior, QWidget):
+    # Длительность появления и скрытия кнопки настроек
+    SETTINGS_FADE_MS = 200
+    
+    def __init__(self, note_id=1, content="", color="#FFFF99", font_family="Arial", 
+                 font_size=10, text_color="#000000", size=(300, 300), 
+                 always_on_top=True, pinned_to_screen=False, theme="default",
+                 gradient_color1=None, gradient_color2=None, gradient_direction="horizontal",
+                 position=None, tags=""):
+        super().__init__()
+        self.assignFields(note_id, color, font_family, font_size, text_color, size,
+                          always_on_top, pinned_to_screen, theme, gradient_color1,
+                          gradient_color2, gradient_direction, position, tags)
         
         # Для управления видимостью кнопки настроек
         self.settings_btn_visible = False
-        self.hide_timer = QTimer()
-        self.hide_timer.setSingleShot(True)
-        self.hide_timer.timeout.connect(self.hideSettingsButton)
+        self.hide_timer = WheelTimer(self.hideSettingsButton)
         
         # Всплывающее окно настроек
         self.settings_popup = None
         
+        # Момент скрытия (для освобождения окна скрытой заметки)
+        self.hidden_since = None
+        
         self.initUI()
         self.text_edit.setPlainText(content)
-        self.loadSettings()
+        
+        if self.pinned_to_screen:
+            TimerWheel.instance().singleShot(100, self.pinToCurrentScreen)
+        
+    def rebind(self, note_id=1, content="", *args, **kwargs):
+        """Привязывает готовое скрытое окно (из пула) к другой заметке
+        
+        Принимает те же аргументы, что и конструктор.
+        """
+        self.assignFields(note_id, *args, **kwargs)
+        self.settings_btn_visible = False
+        self.hide_timer.stop()
+        AnimationDriver.instance().setValue(self.settings_opacity, "opacity", 0.0)
+        self.hidden_since = None
+        self.resizing = False
+        self.resize_direction = None
+        self.dragging = False
+        self.old_pos = None
+        self.geometry_dirty = False
+        self.setHighlighted(False)
+        
+        self.text_edit.setFont(QFont(self.font_family, self.font_size))
+        self.applyTheme()
+        self.updateWindowFlagsSilent()
+        # Текст новой заметки не должен считаться ее правкой
+        self.text_edit.blockSignals(True)
+        self.text_edit.setPlainText(content)
+        self.text_edit.blockSignals(False)
+        self.setGeometry(*self.initialPosition(), self.init_width, self.init_height)
+        
+        if self.pinned_to_screen:
+            TimerWheel.instance().singleShot(100, self.pinToCurrentScreen)
         
     def initUI(self):
         flags = Qt.FramelessWindowHint
@@ -733,8 +1396,7 @@ class ResizableStickyNote(QWidget):
         self.resize_start_geometry = None
         
         # Главный виджет с закругленными углами
-        self.main_widget = QWidget(self)
-        self.applyTheme()
+        self.main_widget = NoteBackground(self, self.backgroundKey())
         
         # Текстовое поле с настройкой цвета текста
         self.text_edit = QTextEdit()
@@ -760,13 +1422,17 @@ class ResizableStickyNote(QWidget):
             }
         """)
         self.settings_btn.clicked.connect(self.showSettingsPopup)
+        # Прозрачность кнопки меняет общий двигатель анимаций
+        self.settings_opacity = QGraphicsOpacityEffect(self.settings_btn)
+        self.settings_opacity.setOpacity(0.0)
+        self.settings_btn.setGraphicsEffect(self.settings_opacity)
         
         # Основной лэйаут
         main_layout = QVBoxLayout(self.main_widget)
         
         # Верхняя панель для кнопки настроек
         top_panel = QWidget()
-        top_panel.setStyleSheet("background: transparent;")
+        self.main_widget.header = top_panel
         top_layout = QHBoxLayout(top_panel)
         top_layout.addStretch()
         top_layout.addWidget(self.settings_btn)
@@ -783,12 +1449,14 @@ class ResizableStickyNote(QWidget):
         window_layout.setContentsMargins(5, 5, 5, 5)
         
         # Позиционируем заметку
-        self.setGeometry(100 + (self.note_id - 1) * 20, 100 + (self.note_id - 1) * 20, 
-                         self.init_width, self.init_height)
+        x, y = self.initialPosition()
+        self.setGeometry(x, y, self.init_width, self.init_height)
         
         # Для перемещения окна
         self.old_pos = None
         self.dragging = False
+        # Геометрия изменена перетаскиванием, но еще не сохранена
+        self.geometry_dirty = False
         
         # Минимальный размер
         self.setMinimumSize(150, 150)
@@ -796,85 +1464,20 @@ class ResizableStickyNote(QWidget):
         # Сохраняем изменения
         self.text_edit.textChanged.connect(self.saveNote)
         
-        # Таймер для проверки положения прикрепленного стикера
-        self.pin_timer = QTimer()
-        self.pin_timer.timeout.connect(self.checkPinnedPosition)
-        if self.pinned_to_screen:
-            self.pin_timer.start(100)
-        
-        # Получаем информацию о мониторах
-        self.updateMonitorInfo()
-        
         # Скрываем кнопку через 2 секунды после создания
-        QTimer.singleShot(2000, self.hideSettingsButton)
+        TimerWheel.instance().singleShot(2000, self.hideSettingsButton)
         
     def applyTheme(self):
-        """Применяет тему к заметке"""
-        if self.theme == "glass":
-            style = f"""
-                QWidget {{
-                    background-color: rgba{self.hex_to_rgba(self.color, 0.8)};
-                    border-radius: 8px;
-                    border: 1px solid rgba(255, 255, 255, 0.3);
-                }}
-            """
-        elif self.theme == "gradient":
-            # Определяем направление градиента
-            if self.gradient_direction == "horizontal":
-                gradient = f"qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 {self.gradient_color1}, stop:1 {self.gradient_color2})"
-            elif self.gradient_direction == "vertical":
-                gradient = f"qlineargradient(x1:0, y1:0, x2:0, y2:1, stop:0 {self.gradient_color1}, stop:1 {self.gradient_color2})"
-            elif self.gradient_direction == "diagonal":
-                gradient = f"qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 {self.gradient_color1}, stop:1 {self.gradient_color2})"
-            else:  # radial
-                gradient = f"qradialgradient(cx:0.5, cy:0.5, radius:0.5, fx:0.5, fy:0.5, stop:0 {self.gradient_color1}, stop:1 {self.gradient_color2})"
-            
-            style = f"""
-                QWidget {{
-                    background: {gradient};
-                    border-radius: 8px;
-                    border: 1px solid rgba(100, 100, 100, 0.2);
-                }}
-            """
-        else:  # default
-            style = f"""
-                QWidget {{
-                    background-color: {self.color};
-                    border-radius: 8px;
-                    border: 1px solid rgba(100, 100, 100, 0.2);
-                }}
-            """
-        
-        self.main_widget.setStyleSheet(style)
-        
-    def hex_to_rgba(self, hex_color, alpha=1.0):
-        """Конвертирует hex в rgba"""
-        hex_color = hex_color.lstrip('#')
-        r = int(hex_color[0:2], 16)
-        g = int(hex_color[2:4], 16)
-        b = int(hex_color[4:6], 16)
-        return f"rgba({r}, {g}, {b}, {alpha})"
-    
-    def lighten_color(self, hex_color, percent):
-        """Осветляет цвет на заданный процент"""
-        hex_color = hex_color.lstrip('#')
-        r = min(255, int(int(hex_color[0:2], 16) * (1 + percent/100)))
-        g = min(255, int(int(hex_color[2:4], 16) * (1 + percent/100)))
-        b = min(255, int(int(hex_color[4:6], 16) * (1 + percent/100)))
-        return f"#{r:02x}{g:02x}{b:02x}"
+        """Применяет тему к заметке: фон рисуется заново, полосы прокрутки получают стиль"""
+        self.main_widget.setStyleKey(self.backgroundKey())
+        self.updateTextColor()
         
     def updateTextColor(self):
         """Обновляет цвет текста в текстовом поле"""
-        style = f"""
-            QTextEdit {{
-                background: transparent;
-                border: none;
-                padding: 10px;
-                color: {self.text_color};
-                font-size: {self.font_size}px;
-            }}
-        """
-        self.text_edit.setStyleSheet(style)
+        style = text_style(self.text_color, self.font_size, self.backgroundKey())
+        # Повторная установка того же стиля заставила бы Qt заново разбирать его
+        if self.text_edit.styleSheet() != style:
+            self.text_edit.setStyleSheet(style)
         
     def enterEvent(self, event):
         """При наведении курсора на стикер показываем кнопку настроек"""
@@ -890,22 +1493,20 @@ class ResizableStickyNote(QWidget):
         """Плавно показываем кнопку настроек"""
         if not self.settings_btn_visible:
             self.settings_btn_visible = True
-            self.animateSettingsButtonOpacity(0, 1)
+            self.animateSettingsButtonOpacity(1.0)
                 
     def hideSettingsButton(self):
         """Плавно скрываем кнопку настроек"""
         if self.settings_btn_visible and not self.underMouse():
             self.settings_btn_visible = False
-            self.animateSettingsButtonOpacity(1, 0)
+            self.animateSettingsButtonOpacity(0.0)
                 
-    def animateSettingsButtonOpacity(self, start, end):
-        """Анимируем изменение прозрачности кнопки настроек"""
-        animation = QPropertyAnimation(self.settings_btn, b"windowOpacity")
-        animation.setDuration(200)
-        animation.setStartValue(start)
-        animation.setEndValue(end)
-        animation.setEasingCurve(QEasingCurve.InOutQuad)
-        animation.start()
+    def animateSettingsButtonOpacity(self, end):
+        """Анимируем изменение прозрачности кнопки настроек
+        
+        Уже идущий переход не дублируется, а продолжается к новому значению.
+        """
+        AnimationDriver.instance().animate(self.settings_opacity, "opacity", end, self.SETTINGS_FADE_MS)
         
     def showSettingsPopup(self):
         """Показывает всплывающее окно с настройками"""
@@ -927,50 +1528,19 @@ class ResizableStickyNote(QWidget):
         if self.settings_popup:
             self.settings_popup.close()
             
-    def openColorGradientDialog(self):
-        """Открывает диалог для выбора цвета или градиента"""
-        self.closeSettingsPopup()
-        
-        dialog = ColorGradientDialog(self.color, self.gradient_color1, self.gradient_color2, self)
-        if dialog.exec_() == QDialog.Accepted:
-            if dialog.result_type == "solid":
-                self.color = dialog.result_color
-                self.theme = "default"
-            else:
-                self.gradient_color1 = dialog.result_gradient1
-                self.gradient_color2 = dialog.result_gradient2
-                self.theme = "gradient"
-            
-            self.applyTheme()
-            self.saveSettings()
-            
-    def openFontTextColorDialog(self):
-        """Открывает диалог для выбора шрифта и цвета текста"""
-        self.closeSettingsPopup()
-        
-        dialog = FontTextColorDialog(self.font_family, self.font_size, self.text_color, self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.font_family = dialog.font_family
-            self.font_size = dialog.font_size
-            self.text_color = dialog.text_color
-            
-            font = QFont(self.font_family, self.font_size)
-            self.text_edit.setFont(font)
-            self.updateTextColor()
-            self.saveSettings()
-        
-    def changeTheme(self):
-        """Меняет тему заметки"""
-        themes = ["default", "gradient", "glass"]
-        current_index = themes.index(self.theme) if self.theme in themes else 0
-        next_theme = themes[(current_index + 1) % len(themes)]
-        self.theme = next_theme
-        self.applyTheme()
-        self.saveSettings()
-        self.closeSettingsPopup()
-        
     def updateWindowFlagsSilent(self):
         """Обновляем флаги окна без пересоздания и скрытия"""
+        window = self.windowHandle()
+        if window is not None:
+            # Окно уже создано системой: меняем флаги у него напрямую. setWindowFlags
+            # пересоздал бы системное окно, а скрытие и показ давали бы мерцание
+            flags = self.windowFlags() & ~Qt.WindowStaysOnTopHint
+            if self.always_on_top:
+                flags |= Qt.WindowStaysOnTopHint
+            self.overrideWindowFlags(flags)
+            window.setFlags(flags)
+            return
+        
         was_visible = self.isVisible()
         geometry = self.geometry()
         
@@ -985,226 +1555,391 @@ class ResizableStickyNote(QWidget):
         if was_visible:
             self.show()
             
-    def updateMonitorInfo(self):
-        """Получаем информацию о доступных мониторах"""
-        try:
-            desktop = QApplication.desktop()
-            screen_count = desktop.screenCount()
-            self.monitors = []
-            
-            for i in range(screen_count):
-                screen_geometry = desktop.screenGeometry(i)
-                self.monitors.append({
-                    'x': screen_geometry.x(),
-                    'y': screen_geometry.y(),
-                    'width': screen_geometry.width(),
-                    'height': screen_geometry.height(),
-                    'right': screen_geometry.x() + screen_geometry.width(),
-                    'bottom': screen_geometry.y() + screen_geometry.height()
-                })
-        except:
-            screen = QApplication.primaryScreen().geometry()
-            self.monitors = [{
-                'x': screen.x(),
-                'y': screen.y(),
-                'width': screen.width(),
-                'height': screen.height(),
-                'right': screen.x() + screen.width(),
-                'bottom': screen.y() + screen.height()
-            }]
-            
-    def getCurrentScreen(self):
-        """Определяем, на каком экране находится центр стикера"""
-        if not hasattr(self, 'monitors'):
-            self.updateMonitorInfo()
-            
-        center_x = self.x() + self.width() // 2
-        center_y = self.y() + self.height() // 2
-        
-        for monitor in self.monitors:
-            if (monitor['x'] <= center_x <= monitor['right'] and 
-                monitor['y'] <= center_y <= monitor['bottom']):
-                return monitor
-        return self.monitors[0] if self.monitors else None
-        
-    def pinToCurrentScreen(self):
-        """Прикрепляем стикер к текущему экрану"""
-        screen = self.getCurrentScreen()
-        if not screen:
-            return
-            
-        geom = self.geometry()
-        margin = 5
-        screen_left = screen['x'] + margin
-        screen_top = screen['y'] + margin
-        screen_right = screen['right'] - margin - geom.width()
-        screen_bottom = screen['bottom'] - margin - geom.height()
-        
-        new_x = max(screen_left, min(geom.x(), screen_right))
-        new_y = max(screen_top, min(geom.y(), screen_bottom))
-        
-        if new_x != geom.x() or new_y != geom.y():
-            self.move(new_x, new_y)
-            
-    def checkPinnedPosition(self):
-        if self.pinned_to_screen:
-            self.pinToCurrentScreen()
-            
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.showSettingsButton()
             self.hide_timer.stop()
             self.closeSettingsPopup()
             
-            rect = self.rect()
-            border_size = 10
-            
-            if event.x() <= border_size:
-                if event.y() <= border_size:
-                    self.resize_direction = 'top-left'
-                elif event.y() >= rect.height() - border_size:
-                    self.resize_direction = 'bottom-left'
-                else:
-                    self.resize_direction = 'left'
-            elif event.x() >= rect.width() - border_size:
-                if event.y() <= border_size:
-                    self.resize_direction = 'top-right'
-                elif event.y() >= rect.height() - border_size:
-                    self.resize_direction = 'bottom-right'
-                else:
-                    self.resize_direction = 'right'
-            elif event.y() <= border_size:
-                self.resize_direction = 'top'
-            elif event.y() >= rect.height() - border_size:
-                self.resize_direction = 'bottom'
-            else:
-                self.dragging = True
-                self.old_pos = event.globalPos()
-                return
-            
-            self.resizing = True
-            self.resize_start_pos = event.globalPos()
-            self.resize_start_geometry = self.geometry()
+            self.pressGesture(event.x(), event.y(), event.globalPos(), event.modifiers())
             
     def mouseMoveEvent(self, event):
-        if self.dragging and self.old_pos:
-            delta = QPoint(event.globalPos() - self.old_pos)
-            self.move(self.x() + delta.x(), self.y() + delta.y())
-            self.old_pos = event.globalPos()
-            self.saveSettings()
-            
-        elif self.resizing and self.resize_start_pos and self.resize_start_geometry:
-            delta = event.globalPos() - self.resize_start_pos
-            new_geometry = QRect(self.resize_start_geometry)
-            
-            if 'left' in self.resize_direction:
-                new_geometry.setLeft(new_geometry.left() + delta.x())
-                if new_geometry.width() < self.minimumWidth():
-                    new_geometry.setLeft(new_geometry.right() - self.minimumWidth())
-                    
-            if 'right' in self.resize_direction:
-                new_geometry.setRight(new_geometry.right() + delta.x())
-                if new_geometry.width() < self.minimumWidth():
-                    new_geometry.setRight(new_geometry.left() + self.minimumWidth())
-                    
-            if 'top' in self.resize_direction:
-                new_geometry.setTop(new_geometry.top() + delta.y())
-                if new_geometry.height() < self.minimumHeight():
-                    new_geometry.setTop(new_geometry.bottom() - self.minimumHeight())
-                    
-            if 'bottom' in self.resize_direction:
-                new_geometry.setBottom(new_geometry.bottom() + delta.y())
-                if new_geometry.height() < self.minimumHeight():
-                    new_geometry.setBottom(new_geometry.top() + self.minimumHeight())
-            
-            self.setGeometry(new_geometry)
+        self.moveGesture(event.globalPos())
             
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton:
-            self.dragging = False
-            self.resizing = False
-            self.resize_direction = None
-            self.old_pos = None
-            self.resize_start_pos = None
-            self.resize_start_geometry = None
-            self.saveSettings()
+            self.releaseGesture()
             self.hide_timer.start(1000)
             
-    def createNewNote(self):
-        if hasattr(self, 'main_window'):
-            self.main_window.createNewNote()
+    def dialogParent(self):
+        return self
+        
+    def setHighlighted(self, highlighted):
+        """Показывает, что заметка выделена для группового изменения"""
+        self.main_widget.setSelected(highlighted)
+        
+    def dispose(self):
+        """Останавливает таймеры и анимацию кнопки перед удалением окна или возвратом в пул"""
+        self.hide_timer.stop()
+        AnimationDriver.instance().forget(self.settings_opacity, "opacity")
         self.closeSettingsPopup()
+
+class SceneNoteItem(NoteBehavior, QGraphicsObject):
+    """Заметка в режиме одной поверхности: элемент сцены вместо отдельного окна
+    
+    Фон рисуется тем же кэшем, что и у окна заметки, текст редактируется
+    прямо на сцене. Перетаскивание, изменение размера, темы и прикрепление
+    к экрану — общие с ResizableStickyNote (NoteBehavior).
+    """
+    GEOMETRY_PROPERTY = b"noteGeometry"
+    # Поля вокруг фона и высота заголовка — как у окна заметки
+    MARGIN = 5
+    HEADER_HEIGHT = 30
+    MIN_SIZE = 150
+    
+    def __init__(self, surfaces, note_id=1, content="", *args, **kwargs):
+        super().__init__()
+        self.assignFields(note_id, *args, **kwargs)
+        self.surfaces = surfaces
+        self.surface = None
+        self.size = QSize(self.init_width, self.init_height)
+        # boundingRect и место кнопки настроек запрашиваются при каждой перерисовке
+        self.bounds = QRectF(0, 0, self.size.width(), self.size.height())
+        self.settings_rect = self.settingsRect()
+        self.style_key = self.backgroundKey()
+        self.highlighted = False
+        # Момент скрытия (для освобождения скрытой заметки)
+        self.hidden_since = None
+        
+        self.resizing = False
+        self.resize_direction = None
+        self.resize_start_pos = None
+        self.resize_start_geometry = None
+        self.dragging = False
+        self.old_pos = None
+        self.geometry_dirty = False
+        
+        self.setFlag(QGraphicsObject.ItemClipsChildrenToShape)
+        self.text_edit = QGraphicsTextItem(self)
+        self.text_edit.setTextInteractionFlags(Qt.TextEditorInteraction)
+        self.text_edit.setPos(self.MARGIN + 4, self.MARGIN + self.HEADER_HEIGHT)
+        self.text_edit.setFont(QFont(self.font_family, self.font_size))
+        self.text_edit.setDefaultTextColor(QColor(self.text_color))
+        self.text_edit.setPlainText(content)
+        self.text_edit.document().contentsChanged.connect(self.saveNote)
+        
+        self.setPos(*self.initialPosition())
+        self.layoutText()
+        surfaces.addNote(self)
+        
+        if self.pinned_to_screen:
+            TimerWheel.instance().singleShot(100, self.pinToCurrentScreen)
             
-    def closeNote(self):
-        if hasattr(self, 'main_window'):
-            self.main_window.closeNote(self.note_id)
-        else:
-            self.close()
+    def boundingRect(self):
+        return self.bounds
+        
+    def paint(self, painter, option, widget=None):
+        width = self.size.width() - 2 * self.MARGIN
+        height = self.size.height() - 2 * self.MARGIN
+        ratio = widget.devicePixelRatioF() if widget is not None else 1.0
+        pixmap = BACKGROUND_CACHE.pixmap(self.style_key, width, height, ratio,
+                                         QRect(0, 0, width, self.HEADER_HEIGHT))
+        painter.drawPixmap(self.MARGIN, self.MARGIN, pixmap)
+        painter.setPen(QColor(100, 100, 100, 204))
+        painter.drawText(self.settings_rect, Qt.AlignCenter, "⚙")
+        if self.highlighted:
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QPen(QColor("#3399FF"), 3))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRoundedRect(QRectF(self.MARGIN, self.MARGIN, width, height).adjusted(1.5, 1.5, -1.5, -1.5),
+                                    8, 8)
             
-    def saveNote(self):
-        if hasattr(self, 'main_window'):
-            self.main_window.saveNotes()
+    def settingsRect(self):
+        """Место кнопки настроек в заголовке"""
+        return QRectF(self.size.width() - self.MARGIN - 30, self.MARGIN + 5, 25, 25)
+        
+    def layoutText(self):
+        self.text_edit.setTextWidth(self.size.width() - 2 * self.MARGIN - 8)
+        
+    def geometry(self):
+        position = self.pos()
+        return QRect(round(position.x()), round(position.y()), self.size.width(), self.size.height())
+        
+    def setGeometry(self, geometry):
+        if geometry.size() != self.size:
+            self.prepareGeometryChange()
+            self.size = QSize(geometry.size())
+            self.bounds = QRectF(0, 0, self.size.width(), self.size.height())
+            self.settings_rect = self.settingsRect()
+            self.layoutText()
+        self.setPos(geometry.x(), geometry.y())
+        self.surfaces.noteMoved(self)
+        
+    noteGeometry = pyqtProperty(QRect, fget=geometry, fset=setGeometry)
+        
+    def move(self, position):
+        self.setPos(position.x(), position.y())
+        self.surfaces.noteMoved(self)
+        
+    def resize(self, width, height):
+        self.setGeometry(QRect(self.geometry().topLeft(), QSize(width, height)))
+        
+    def minimumWidth(self):
+        return self.MIN_SIZE
+        
+    def minimumHeight(self):
+        return self.MIN_SIZE
+        
+    def applyTheme(self):
+        self.style_key = self.backgroundKey()
+        self.text_edit.setDefaultTextColor(QColor(self.text_color))
+        self.update()
+        
+    def updateWindowFlagsSilent(self):
+        """Поверх всех окон держится поверхность экрана целиком"""
+        self.surfaces.updateStaysOnTop()
+        
+    def setUpdatesEnabled(self, enabled):
+        """Сцена и так перерисовывает все изменения одним проходом"""
+        
+    def setHighlighted(self, highlighted):
+        if highlighted != self.highlighted:
+            self.highlighted = highlighted
+            self.update()
             
-    def saveSettings(self):
-        settings = QSettings("StickyNotes", "NoteSettings")
-        settings.setValue(f"note_{self.note_id}_geometry", self.geometry())
-        settings.setValue(f"note_{self.note_id}_color", self.color)
-        settings.setValue(f"note_{self.note_id}_font_family", self.font_family)
-        settings.setValue(f"note_{self.note_id}_font_size", self.font_size)
-        settings.setValue(f"note_{self.note_id}_text_color", self.text_color)
-        settings.setValue(f"note_{self.note_id}_always_on_top", self.always_on_top)
-        settings.setValue(f"note_{self.note_id}_pinned_to_screen", self.pinned_to_screen)
-        settings.setValue(f"note_{self.note_id}_theme", self.theme)
-        settings.setValue(f"note_{self.note_id}_gradient_color1", self.gradient_color1)
-        settings.setValue(f"note_{self.note_id}_gradient_color2", self.gradient_color2)
-        settings.setValue(f"note_{self.note_id}_gradient_direction", self.gradient_direction)
-        
-    def loadSettings(self):
-        settings = QSettings("StickyNotes", "NoteSettings")
-        geometry = settings.value(f"note_{self.note_id}_geometry")
-        if geometry:
-            self.setGeometry(geometry)
-        color = settings.value(f"note_{self.note_id}_color", self.color)
-        if color:
-            self.color = color
-        font_family = settings.value(f"note_{self.note_id}_font_family", self.font_family)
-        font_size = int(settings.value(f"note_{self.note_id}_font_size", self.font_size))
-        self.font_family = font_family
-        self.font_size = font_size
-        self.text_edit.setFont(QFont(font_family, font_size))
+    def raise_(self):
+        self.setZValue(self.surfaces.nextZ())
         
-        # Загружаем цвет текста
-        text_color = settings.value(f"note_{self.note_id}_text_color", self.text_color)
-        self.text_color = text_color
+    def activateWindow(self):
+        if self.surface is not None:
+            self.surface.activateWindow()
+            
+    def dialogParent(self):
+        return self.surface
         
-        # Загружаем тему
-        theme = settings.value(f"note_{self.note_id}_theme", self.theme)
-        self.theme = theme
+    def closeSettingsPopup(self):
+        """Настройки открываются меню, которое закрывается само"""
+        
+    def itemChange(self, change, value):
+        if change == QGraphicsObject.ItemVisibleHasChanged and self.surface is not None:
+            self.surface.scheduleMaskUpdate()
+        return super().itemChange(change, value)
+        
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton:
+            event.ignore()
+            return
+        if self.settings_rect.contains(event.pos()):
+            self.showSettingsMenu(event.screenPos())
+            return
+        self.raise_()
+        self.pressGesture(event.pos().x(), event.pos().y(), event.screenPos(), event.modifiers())
         
-        # Загружаем настройки градиента
-        gradient_color1 = settings.value(f"note_{self.note_id}_gradient_color1")
-        if gradient_color1:
-            self.gradient_color1 = gradient_color1
+    def mouseMoveEvent(self, event):
+        self.moveGesture(event.screenPos())
+        
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.releaseGesture()
             
-        gradient_color2 = settings.value(f"note_{self.note_id}_gradient_color2")
-        if gradient_color2:
-            self.gradient_color2 = gradient_color2
+    def releaseGesture(self):
+        super().releaseGesture()
+        # Заметка, перетащенная на другой монитор, переходит на его поверхность
+        self.surfaces.noteMoved(self)
+        
+    def contextMenuEvent(self, event):
+        self.showSettingsMenu(event.screenPos())
+        
+    def showSettingsMenu(self, position):
+        """Меню настроек заметки (вместо всплывающего окна настроек)"""
+        menu = QMenu()
+        menu.addAction("+ Новая заметка", self.createNewNote)
+        menu.addAction("🎨🌈 Цвет и градиент", self.openColorGradientDialog)
+        menu.addAction("A T Шрифт и цвет текста", self.openFontTextColorDialog)
+        menu.addAction("🎭 Тема", self.changeTheme)
+        menu.addAction("🏷 Теги", self.editTags)
+        menu.addAction("🗂 Рабочий стол", self.moveToWorkspace)
+        on_top = menu.addAction("Поверх всех окон", self.toggleAlwaysOnTop)
+        on_top.setCheckable(True)
+        on_top.setChecked(self.always_on_top)
+        menu.addSeparator()
+        menu.addAction("× Закрыть заметку", self.closeNote)
+        menu.exec_(position)
+        
+    def toggleAlwaysOnTop(self):
+        if hasattr(self, 'main_window'):
+            self.main_window.updateNotes([self.note_id], always_on_top=not self.always_on_top)
             
-        gradient_direction = settings.value(f"note_{self.note_id}_gradient_direction", "horizontal")
-        self.gradient_direction = gradient_direction
+    def dispose(self):
+        """Убирает заметку с поверхности"""
+        self.surfaces.removeNote(self)
+        
+class NoteSurface(QGraphicsView):
+    """Прозрачное окно на всю доступную область экрана; заметки — элементы его сцены
+    
+    Координаты сцены совпадают с координатами экрана, поэтому у заметок те же
+    x и y, что у отдельных окон. Маска окна — объединение видимых заметок,
+    так что мимо заметок мышь попадает в окна под поверхностью.
+    """
+    def __init__(self, available):
+        super().__init__()
+        self.available = QRect(available)
+        self.notes = set()
+        self.region = QRegion()
+        self.setScene(QGraphicsScene(QRectF(self.available), self))
+        self.setSceneRect(QRectF(self.available))
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool | Qt.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setStyleSheet("background: transparent;")
+        self.setFrameShape(QFrame.NoFrame)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.setGeometry(self.available)
+        
+        # Маска пересчитывается один раз за проход цикла событий
+        self.mask_timer = WheelTimer(self.updateMask)
+        
+    def addNote(self, note):
+        self.notes.add(note)
+        note.surface = self
+        self.scene().addItem(note)
+        self.scheduleMaskUpdate()
+        
+    def removeNote(self, note):
+        self.notes.discard(note)
+        note.surface = None
+        self.scene().removeItem(note)
+        self.scheduleMaskUpdate()
+        
+    def scheduleMaskUpdate(self):
+        if not self.mask_timer.isActive():
+            self.mask_timer.start(0)
+            
+    def updateMask(self):
+        offset = self.available.topLeft()
+        regions = [QRegion(note.geometry().translated(-offset)) for note in self.notes if note.isVisible()]
+        # Объединение попарно: сложность областей растет равномерно, а не с каждой заметкой
+        while len(regions) > 1:
+            paired = [first.united(second) for first, second in zip(regions[::2], regions[1::2])]
+            if len(regions) % 2:
+                paired.append(regions[-1])
+            regions = paired
+        self.region = regions[0] if regions else QRegion()
+        if self.region.isEmpty():
+            self.hide()
+            return
+        self.setMask(self.region)
+        self.show()
+        
+    def extendMask(self, geometry):
+        """Добавляет к маске место заметки во время жеста; полный пересчет — после него"""
+        self.region = self.region.united(geometry.translated(-self.available.topLeft()))
+        self.setMask(self.region)
+        
+    def setStaysOnTop(self, on_top):
+        """Меняет флаг «поверх всех окон» без пересоздания окна, как у заметок"""
+        flags = self.windowFlags() & ~Qt.WindowStaysOnTopHint
+        if on_top:
+            flags |= Qt.WindowStaysOnTopHint
+        if flags == self.windowFlags():
+            return
+        self.overrideWindowFlags(flags)
+        if self.windowHandle() is not None:
+            self.windowHandle().setFlags(flags)
+            
+class NoteSurfaces(QObject):
+    """Поверхности всех экранов для режима одной поверхности"""
+    def __init__(self, screens):
+        super().__init__()
+        self.screens = screens
+        self.surfaces = []
+        self.z = 0
+        # Во время групповой правки флаг "поверх всех окон" пересчитывается один раз в конце
+        self.batch_depth = 0
+        self.stays_on_top_dirty = False
+        self.rebuild()
+        
+    def rebuild(self):
+        """Создает поверхности заново по текущим экранам и переносит на них заметки"""
+        notes = [note for surface in self.surfaces for note in list(surface.notes)]
+        for note in notes:
+            note.surface.removeNote(note)
+        self.close()
+        self.surfaces = [NoteSurface(available) for _, available in self.screens.screens]
+        for note in notes:
+            self.addNote(note)
+        self.updateStaysOnTop()
+        
+    def surfaceFor(self, geometry):
+        available = self.screens.availableFor(geometry)
+        for surface in self.surfaces:
+            if surface.available == available:
+                return surface
+        return self.surfaces[0] if self.surfaces else None
+        
+    def addNote(self, note):
+        self.surfaceFor(note.geometry()).addNote(note)
+        
+    def removeNote(self, note):
+        if note.surface is not None:
+            note.surface.removeNote(note)
+            
+    def noteMoved(self, note):
+        """Обновляет маску поверхности; по окончании жеста переносит заметку на экран ее центра"""
+        surface = note.surface
+        if surface is None:
+            return
+        if note.dragging or note.resizing:
+            surface.extendMask(note.geometry())
+            return
+        target = self.surfaceFor(note.geometry())
+        if target is not surface:
+            surface.removeNote(note)
+            target.addNote(note)
+            return
+        surface.scheduleMaskUpdate()
         
-        self.always_on_top = settings.value(f"note_{self.note_id}_always_on_top", "true").lower() == "true"
-        self.pinned_to_screen = settings.value(f"note_{self.note_id}_pinned_to_screen", "false").lower() == "true"
+    def nextZ(self):
+        self.z += 1
+        return self.z
         
-        # Применяем тему после загрузки всех настроек
-        self.applyTheme()
-        self.updateTextColor()
+    def beginBatch(self):
+        self.batch_depth += 1
         
-        if self.pinned_to_screen:
-            self.pin_timer.start(100)
-            QTimer.singleShot(100, self.pinToCurrentScreen)
+    def endBatch(self):
+        self.batch_depth -= 1
+        if not self.batch_depth and self.stays_on_top_dirty:
+            self.updateStaysOnTop()
+            
+    def updateStaysOnTop(self):
+        """Поверхность поверх всех окон, если на ней есть такая заметка"""
+        if self.batch_depth:
+            self.stays_on_top_dirty = True
+            return
+        self.stays_on_top_dirty = False
+        for surface in self.surfaces:
+            surface.setStaysOnTop(any(note.always_on_top for note in surface.notes))
+            
+    def close(self):
+        for surface in self.surfaces:
+            surface.mask_timer.stop()
+            surface.hide()
+            surface.deleteLater()
+        self.surfaces = []
 
 class StickyNotesApp:
+    # Размер новой заметки (как у ResizableStickyNote по умолчанию)
+    NEW_NOTE_SIZE = (300, 300)
+    # Поля заметки, которые старые версии хранили в QSettings как note_{id}_{поле}
+    LEGACY_NOTE_FIELDS = ("color", "font_family", "font_size", "text_color", "always_on_top",
+                          "pinned_to_screen", "theme", "gradient_color1", "gradient_color2",
+                          "gradient_direction")
+    # Длительность перестановки заметок при упорядочивании
+    ARRANGE_DURATION_MS = 300
+    # Сколько времени за один проход индексируются заметки для поиска
+    SEARCH_INDEX_SLICE_MS = 8
+    
     def __init__(self):
         self.VERSION = "1.1.0"
         self.UPDATE_URL = "https://raw.githubusercontent.com/DaniiL-Buzakov/Stikers/main/version.json"
@@ -1245,6 +1980,10 @@ class StickyNotesApp:
         new_note_action.triggered.connect(self.createNewNote)
         tray_menu.addAction(new_note_action)
         
+        search_action = QAction("Поиск…", self.app)
+        search_action.triggered.connect(self.showSearch)
+        tray_menu.addAction(search_action)
+        
         # Пункт для ручной проверки обновлений
         check_update_action = QAction("Проверить обновления", self.app)
         check_update_action.triggered.connect(self.checkForUpdatesManual)
@@ -1258,6 +1997,20 @@ class StickyNotesApp:
         hide_all_action.triggered.connect(self.hideAllNotes)
         tray_menu.addAction(hide_all_action)
         
+        # Показ и скрытие заметок по тегам (список тегов строится при открытии)
+        self.tags_menu = QMenu("Теги")
+        self.tags_menu.aboutToShow.connect(self.updateTagsMenu)
+        tray_menu.addMenu(self.tags_menu)
+        
+        # Рабочие столы: у каждого свой набор заметок и их расположение
+        self.workspaces_menu = QMenu("Рабочие столы")
+        self.workspaces_menu.aboutToShow.connect(self.updateWorkspacesMenu)
+        tray_menu.addMenu(self.workspaces_menu)
+        
+        history_action = QAction("История заметок…", self.app)
+        history_action.triggered.connect(self.showHistory)
+        tray_menu.addAction(history_action)
+        
         tray_menu.addSeparator()
         
         manage_menu = QMenu("Управление всеми заметками")
@@ -1282,6 +2035,22 @@ class StickyNotesApp:
         resize_all_large.triggered.connect(lambda: self.resizeAllNotes(400, 400))
         manage_menu.addAction(resize_all_large)
         
+        arrange_menu = manage_menu.addMenu("Упорядочить")
+        for layout, title in (("grid", "Плиткой"), ("cascade", "Каскадом"), ("pack", "Плотно по размеру")):
+            arrange_menu.addAction(title, lambda layout=layout: self.arrangeNotes(layout))
+        
+        theme_menu = manage_menu.addMenu("Тема")
+        for theme, title in (("default", "Обычная"), ("gradient", "Градиент"), ("glass", "Стекло")):
+            theme_menu.addAction(title, lambda theme=theme: self.updateNotes(list(self.records.keys()),
+                                                                            theme=theme))
+        
+        # Все заметки в одном окне на экран вместо отдельного окна на заметку
+        self.single_surface_action = QAction("Одна поверхность для всех заметок", self.app)
+        self.single_surface_action.setCheckable(True)
+        self.single_surface_action.triggered.connect(
+            lambda checked: self.setRenderMode("scene" if checked else "windows"))
+        manage_menu.addAction(self.single_surface_action)
+        
         tray_menu.addMenu(manage_menu)
         
         tray_menu.addSeparator()
@@ -1294,19 +2063,127 @@ class StickyNotesApp:
         self.tray_icon.show()
         self.tray_icon.activated.connect(self.trayIconActivated)
         
+        # Сохраняем несохраненное при завершении сеанса Windows и при выходе
+        self.app.commitDataRequest.connect(self.flushPendingSaves)
+        self.app.aboutToQuit.connect(self.shutdownPersistence)
+        
+        self.initPersistence(get_database_path(), QSettings("StickyNotes", "Settings"))
+        # Запасные окна пула удаляются при выходе, как и окна заметок
+        self.app.aboutToQuit.connect(self.note_pool.clear)
+        self.initScreenTracking()
+        self.single_surface_action.setChecked(self.render_mode == "scene")
+        
         # Загружаем заметки
-        self.notes = {}
         self.loadNotes()
+        self.persistence.start()
+        self.compactLegacySettings()
         
         # Если нет заметок, создаем одну
-        if not self.notes:
+        if not self.records:
             self.createNewNote()
+        # Запасные окна для новых заметок готовятся после запуска, в простое
+        if self.render_mode == "windows":
+            self.note_pool.scheduleWarmUp()
             
         # Запускаем проверку обновлений при старте (с задержкой)
-        QTimer.singleShot(2000, self.checkForUpdatesAuto)
+        TimerWheel.instance().singleShot(2000, self.checkForUpdatesAuto)
         
         sys.exit(self.app.exec_())
     
+    def initPersistence(self, database_path, app_settings):
+        """Создает хранилище, журнал, историю и автосохранение заметок"""
+        # Отложенное автосохранение: правки объединяются в одну запись
+        self.autosave = AutosaveScheduler(
+            self.flushDirtyNotes,
+            int(app_settings.value("autosave_idle_ms", AutosaveScheduler.DEFAULT_IDLE_MS)),
+            int(app_settings.value("autosave_max_delay_ms", AutosaveScheduler.DEFAULT_MAX_DELAY_MS))
+        )
+        
+        # Хранилище заметок (SQLite)
+        self.store = NoteStore(database_path)
+        self.migrateLegacyNotes()
+        # История версий хранится в той же базе
+        self.history = NoteHistory(
+            database_path,
+            max_revisions=int(app_settings.value("history_max_revisions",
+                                                 NoteHistory.DEFAULT_MAX_REVISIONS)),
+            max_bytes=int(app_settings.value("history_max_bytes", NoteHistory.DEFAULT_MAX_BYTES))
+        )
+        # Журнал изменений: сохранение дописывает только изменившиеся поля
+        self.journal = NoteJournal(
+            self.store,
+            compact_bytes=int(app_settings.value("journal_compact_bytes",
+                                                 NoteJournal.DEFAULT_COMPACT_BYTES))
+        )
+        # Сериализация и запись на диск выполняются в отдельном потоке
+        self.persistence = PersistenceWorker(self.journal, self.history)
+        self.persistence.error.connect(self.showPersistenceError)
+        self.persistence_error_shown_at = None
+        
+        # Загружаются только заметки активного рабочего стола
+        self.workspace = self.store.get_meta(NoteStore.ACTIVE_WORKSPACE_KEY, NOTE_DEFAULTS["workspace"])
+        # Записи заметок рабочего стола и окна только для созданных (видимых) из них
+        self.records = {}
+        self.notes = {}
+        # Индекс для поиска строится порциями после загрузки и дальше обновляется по изменениям
+        self.search_index = None
+        self.search_pending = []
+        self.search_index_timer = WheelTimer(self.indexSearchSlice)
+        self.search_popup = None
+        # Индекс тегов обновляется при каждом сохранении заметки
+        self.tag_index = TagIndex()
+        # Номера видимых заметок (чтобы не обходить все окна при переключении тегов)
+        self.visible_ids = set()
+        # Занятые видимыми заметками места на экранах (для размещения новых заметок)
+        self.placement = PlacementEngine()
+        # Заметки, выделенные Ctrl+кликом для группового изменения
+        self.selected_ids = set()
+        # Готовые окна для новых заметок вместо создания каждый раз заново
+        self.note_pool = WidgetPool(
+            self.createSpareNote,
+            max_size=int(app_settings.value("note_pool_size", WidgetPool.DEFAULT_MAX_SIZE)),
+            spares=int(app_settings.value("note_pool_spares", WidgetPool.DEFAULT_SPARES))
+        )
+        # "windows" — заметка в отдельном окне, "scene" — заметки в одной сцене на экран
+        self.render_mode = app_settings.value("render_mode", "windows")
+        self.surfaces = None
+        # Общая анимация перестановки заметок при упорядочивании
+        self.arrange_animation = None
+        # Окна скрытых заметок освобождаются после периода бездействия
+        self.release_hidden_after_ms = int(app_settings.value("release_hidden_after_ms", 5 * 60 * 1000))
+        self.release_timer = WheelTimer(self.releaseHiddenNotes)
+        # Скрытая заметка, показанная для просмотра из поиска
+        self.preview_id = None
+    
+    def initScreenTracking(self):
+        """Заметки возвращаются на экран при изменении набора или размеров экранов"""
+        self.screens = ScreenRegistry.instance()
+        self.placement.set_screens(self.screenAreas())
+        self.screens.changed.connect(self.onScreensChanged)
+        
+    def screenAreas(self):
+        """Доступные области экранов в виде (x, y, width, height)"""
+        return [(available.x(), available.y(), available.width(), available.height())
+                for _, available in self.screens.screens]
+            
+    def onScreensChanged(self):
+        """Возвращает на экран прикрепленные заметки и заметки с отключенных мониторов"""
+        self.placement.set_screens(self.screenAreas())
+        if self.surfaces is not None:
+            self.surfaces.rebuild()
+        moved = []
+        for note_id, note in self.notes.items():
+            geometry = note.geometry()
+            if not note.pinned_to_screen and self.screens.contains(geometry.center()):
+                continue
+            position = note.clampToScreen(geometry)
+            if position != geometry.topLeft():
+                note.move(position)
+                moved.append(note_id)
+        # Новые положения сохраняются одной записью
+        if moved:
+            self.saveNotes(moved)
+    
     def checkForUpdatesAuto(self):
         """Автоматическая проверка обновлений при запуске"""
         self.checkForUpdates(show_message=False)
@@ -1372,132 +2249,722 @@ class StickyNotesApp:
             )
         
     def createNewNote(self):
-        note_id = max(self.notes.keys(), default=0) + 1
-        note = ResizableStickyNote(note_id)
-        note.main_window = self
+        # Номера закрытых заметок с историей не занимаем, чтобы история не смешивалась;
+        # заметки других рабочих столов не загружены, их номера знает журнал
+        note_id = max(max(self.records.keys(), default=0), self.history.max_note_id(),
+                      self.journal.max_note_id) + 1
+        # Новая заметка встает на ближайшее к курсору свободное место
+        cursor = QCursor.pos()
+        note = self.buildNote(note_id, position=self.placement.find_place(
+            *self.NEW_NOTE_SIZE, (cursor.x(), cursor.y())))
         note.show()
         self.notes[note_id] = note
-        self.saveNotes()
+        self.records[note_id] = dict(note.toRecord(), visible=True, workspace=self.workspace)
+        self.visible_ids.add(note_id)
+        self.saveNotes([note_id])
+        
+    def createNoteWidget(self, note_id, note_data):
+        """Создает окно заметки по сохраненной записи"""
+        position = None
+        if note_data["x"] is not None and note_data["y"] is not None:
+            position = (note_data["x"], note_data["y"])
+        note = self.buildNote(
+            note_id,
+            note_data["content"],
+            note_data["color"],
+            note_data["font_family"],
+            note_data["font_size"],
+            note_data["text_color"],
+            (note_data["width"], note_data["height"]),
+            note_data["always_on_top"],
+            note_data["pinned_to_screen"],
+            note_data["theme"],
+            note_data["gradient_color1"],
+            note_data["gradient_color2"],
+            note_data["gradient_direction"],
+            position,
+            note_data["tags"]
+        )
+        note.setHighlighted(note_id in self.selected_ids)
+        # Монитор, на котором заметку оставили, мог быть отключен, пока она была скрыта
+        if not ScreenRegistry.instance().contains(note.geometry().center()):
+            note.move(note.clampToScreen(note.geometry()))
+        return note
+        
+    def buildNote(self, note_id, content="", *args, **kwargs):
+        """Окно заметки: готовое из пула или новое (аргументы — как у ResizableStickyNote)"""
+        if self.render_mode == "scene":
+            note = SceneNoteItem(self.noteSurfaces(), note_id, content, *args, **kwargs)
+            note.main_window = self
+            return note
+        note = self.note_pool.acquire()
+        if note is None:
+            note = ResizableStickyNote(note_id, content, *args, **kwargs)
+        else:
+            note.rebind(note_id, content, *args, **kwargs)
+            self.note_pool.scheduleWarmUp()
+        note.main_window = self
+        return note
         
-    def showAllNotes(self):
-        for note in self.notes.values():
+    def noteSurfaces(self):
+        """Поверхности экранов для режима одной поверхности (создаются при первом обращении)"""
+        if self.surfaces is None:
+            self.surfaces = NoteSurfaces(ScreenRegistry.instance())
+        return self.surfaces
+        
+    def setRenderMode(self, mode):
+        """Переключает режим отображения: заметки выгружаются и загружаются заново"""
+        if mode == self.render_mode:
+            return
+        self.unloadNotes()
+        self.render_mode = mode
+        QSettings("StickyNotes", "Settings").setValue("render_mode", mode)
+        if mode != "scene" and self.surfaces is not None:
+            self.surfaces.close()
+            self.surfaces = None
+        self.loadNotes()
+        
+    def createSpareNote(self):
+        """Скрытое окно для пула: системное окно создается сразу, без показа"""
+        note = ResizableStickyNote(0)
+        note.winId()
+        return note
+        
+    def discardNoteWidget(self, note):
+        """Убирает окно заметки: возвращает в пул или удаляет"""
+        # Общая анимация перестановки не должна двигать окно, отданное другой заметке
+        self.finishArrangeAnimation()
+        note.hide()
+        note.dispose()
+        if not isinstance(note, ResizableStickyNote):
+            note.deleteLater()
+        elif not self.note_pool.release(note):
+            note.deleteLater()
+        
+    def materializeNote(self, note_id):
+        """Возвращает окно заметки, создавая его из записи при необходимости"""
+        note = self.notes.get(note_id)
+        if note is None and note_id in self.records:
+            note = self.createNoteWidget(note_id, self.records[note_id])
+            self.notes[note_id] = note
+        return note
+        
+    def releaseNote(self, note_id):
+        """Сохраняет заметку и освобождает ее окно, оставляя только запись"""
+        if note_id not in self.notes:
+            return
+        self.saveNotes([note_id])
+        self.discardNoteWidget(self.notes.pop(note_id))
+        
+    def releaseHiddenNotes(self):
+        """Освобождает окна заметок, скрытых дольше release_hidden_after_ms"""
+        now = time.monotonic()
+        delay = self.release_hidden_after_ms / 1000
+        next_check = None
+        for note_id, note in list(self.notes.items()):
+            if note.isVisible() or note.hidden_since is None:
+                continue
+            remaining = note.hidden_since + delay - now
+            if remaining <= 0:
+                self.releaseNote(note_id)
+            else:
+                next_check = remaining if next_check is None else min(next_check, remaining)
+        if next_check is not None:
+            self.release_timer.start(int(next_check * 1000) + 1)
+            
+    def showNote(self, note_id):
+        """Показывает заметку, при необходимости создавая ее окно"""
+        note = self.materializeNote(note_id)
+        if note is None:
+            return None
+        note.hidden_since = None
+        note.show()
+        if not self.records[note_id]["visible"]:
+            self.records[note_id]["visible"] = True
+            self.visible_ids.add(note_id)
+            self.scheduleSave(note_id)
+        return note
+        
+    def syncRecords(self):
+        """Переносит в записи текущее состояние открытых окон"""
+        for note_id, note in self.notes.items():
+            self.records[note_id].update(note.toRecord())
+            
+    def setNotesVisible(self, note_ids, visible):
+        """Показывает или скрывает заметки одной операцией с одной записью на диск"""
+        if visible:
+            self.changeNotesVisibility(note_ids, ())
+        else:
+            self.changeNotesVisibility((), note_ids)
+            
+    def changeNotesVisibility(self, shown_ids, hidden_ids):
+        """Показывает shown_ids и скрывает hidden_ids за один проход с одной записью на диск"""
+        changed = []
+        hidden = False
+        for note_ids, visible in ((shown_ids, True), (hidden_ids, False)):
+            for note_id in note_ids:
+                record = self.records.get(note_id)
+                if record is None:
+                    continue
+                if visible:
+                    note = self.materializeNote(note_id)
+                    note.hidden_since = None
+                    note.show()
+                else:
+                    note = self.notes.get(note_id)
+                    if note is not None and note.isVisible():
+                        note.hide()
+                        note.hidden_since = time.monotonic()
+                if record["visible"] != visible:
+                    record["visible"] = visible
+                    changed.append(note_id)
+                    if visible:
+                        self.visible_ids.add(note_id)
+                    else:
+                        self.visible_ids.discard(note_id)
+                        hidden = True
+        if hidden and not self.release_timer.isActive():
+            self.release_timer.start(self.release_hidden_after_ms)
+        if changed:
+            self.saveNotes(changed)
+            
+    def previewNote(self, note_id):
+        """Показывает заметку поверх остальных окон, не меняя ее видимость в записи"""
+        if note_id != self.preview_id:
+            self.endPreview()
+        note = self.materializeNote(note_id)
+        if note is None:
+            return
+        if not self.records[note_id]["visible"]:
+            self.preview_id = note_id
+            note.hidden_since = None
             note.show()
+        note.raise_()
+        
+    def endPreview(self):
+        """Снова скрывает заметку, которая была показана только для просмотра"""
+        note_id, self.preview_id = self.preview_id, None
+        record = self.records.get(note_id)
+        if record is None or record["visible"]:
+            return
+        note = self.notes.get(note_id)
+        if note is not None and note.isVisible():
+            note.hide()
+            note.hidden_since = time.monotonic()
+            if not self.release_timer.isActive():
+                self.release_timer.start(self.release_hidden_after_ms)
+            
+    def showAllNotes(self):
+        self.setNotesVisible(list(self.records.keys()), True)
             
     def hideAllNotes(self):
-        for note in self.notes.values():
-            note.hide()
+        self.setNotesVisible(list(self.records.keys()), False)
+        
+    def showTaggedNotes(self, tag):
+        """Показывает заметки с тегом"""
+        self.setNotesVisible(self.tag_index.notes(tag), True)
+        
+    def hideTaggedNotes(self, tag):
+        """Скрывает заметки с тегом"""
+        self.setNotesVisible(self.tag_index.notes(tag), False)
+        
+    def showOnlyTaggedNotes(self, tag):
+        """Оставляет на экране только заметки с тегом (например, «работа» вместо «дом»)"""
+        tagged = self.tag_index.notes(tag)
+        self.changeNotesVisibility(tagged, self.visible_ids - tagged)
+        
+    def updateTagsMenu(self):
+        """Заполняет меню тегов в трее"""
+        self.autosave.flush()
+        self.tags_menu.clear()
+        tags = self.tag_index.tags()
+        if not tags:
+            empty_action = self.tags_menu.addAction("Нет тегов (добавьте #тег в текст)")
+            empty_action.setEnabled(False)
+            return
+        for tag, count in tags:
+            tag_menu = self.tags_menu.addMenu(f"#{tag} ({count})")
+            tag_menu.addAction("Показать", lambda tag=tag: self.showTaggedNotes(tag))
+            tag_menu.addAction("Скрыть", lambda tag=tag: self.hideTaggedNotes(tag))
+            tag_menu.addAction("Только эти", lambda tag=tag: self.showOnlyTaggedNotes(tag))
             
     def toggleAllAlwaysOnTop(self):
-        if not self.notes:
+        if not self.records:
             return
             
-        first_note = list(self.notes.values())[0]
-        new_state = not first_note.always_on_top
-        
-        for note in self.notes.values():
-            note.always_on_top = new_state
-            note.updateWindowFlagsSilent()
-            note.saveSettings()
+        self.syncRecords()
+        new_state = not next(iter(self.records.values()))["always_on_top"]
+        self.updateNotes(list(self.records.keys()), always_on_top=new_state)
             
     def toggleAllPinned(self):
-        if not self.notes:
+        if not self.records:
             return
             
-        first_note = list(self.notes.values())[0]
-        new_state = not first_note.pinned_to_screen
-        
-        for note in self.notes.values():
-            note.pinned_to_screen = new_state
+        self.syncRecords()
+        new_state = not next(iter(self.records.values()))["pinned_to_screen"]
+        fields = {"pinned_to_screen": new_state}
+        # Прикрепленная заметка не бывает поверх всех окон
+        if new_state:
+            fields["always_on_top"] = False
+        self.updateNotes(list(self.records.keys()), **fields)
             
-            if new_state and note.always_on_top:
-                note.always_on_top = False
-                note.updateWindowFlagsSilent()
-                
-            if new_state:
-                note.pin_timer.start(100)
-                note.pinToCurrentScreen()
-            else:
-                note.pin_timer.stop()
-            note.saveSettings()
+    def updateNotes(self, note_ids, **fields):
+        """Меняет поля нескольких заметок одной операцией
+        
+        Окна не перерисовываются, пока изменения применяются ко всем, флаги
+        окна меняются без пересоздания системных окон, а результат сохраняется
+        одной записью. Записи заметок без окон обновляются только на диске.
+        """
+        note_ids = [note_id for note_id in note_ids if note_id in self.records]
+        notes = [self.notes[note_id] for note_id in note_ids if note_id in self.notes]
+        for note in notes:
+            note.setUpdatesEnabled(False)
+        if self.surfaces is not None:
+            self.surfaces.beginBatch()
+        try:
+            for note in notes:
+                note.applyFields(fields)
+        finally:
+            if self.surfaces is not None:
+                self.surfaces.endBatch()
+            for note in notes:
+                note.setUpdatesEnabled(True)
+        for note_id in note_ids:
+            self.records[note_id].update(fields)
+        self.saveNotes(note_ids)
             
     def resizeAllNotes(self, width, height):
-        for note in self.notes.values():
-            note.resize(width, height)
-            note.saveSettings()
+        self.updateNotes(list(self.records.keys()), width=width, height=height)
+        
+    def toggleNoteSelection(self, note_id):
+        """Добавляет заметку в выделение или убирает из него (Ctrl+клик)"""
+        selected = note_id not in self.selected_ids
+        if selected:
+            self.selected_ids.add(note_id)
+        else:
+            self.selected_ids.discard(note_id)
+        note = self.notes.get(note_id)
+        if note is not None:
+            note.setHighlighted(selected)
+            
+    def clearSelection(self):
+        for note_id in self.selected_ids:
+            note = self.notes.get(note_id)
+            if note is not None:
+                note.setHighlighted(False)
+        self.selected_ids = set()
+        
+    def selectedWith(self, note_id):
+        """Заметки, которые меняются вместе с note_id: все выделенные, если она среди них"""
+        if note_id in self.selected_ids:
+            return sorted(self.selected_ids)
+        return [note_id]
+            
+    def arrangeNotes(self, layout):
+        """Упорядочивает видимые заметки по всем экранам: grid, cascade или pack
+        
+        Новые положения считаются одним проходом, окна переезжают одной общей
+        анимацией, а результат сохраняется одной записью после ее окончания.
+        """
+        self.finishArrangeAnimation()
+        self.syncRecords()
+        note_ids = sorted(self.visible_ids & set(self.notes))
+        notes = [(note_id, self.records[note_id]["width"], self.records[note_id]["height"])
+                 for note_id in note_ids]
+        geometries = LAYOUTS[layout](notes, self.screenAreas())
+        if not geometries:
+            return
+        
+        group = QParallelAnimationGroup()
+        for note_id, (x, y, width, height) in geometries.items():
+            note = self.notes[note_id]
+            target = QRect(x, y, width, height)
+            if note.geometry() == target:
+                continue
+            animation = QPropertyAnimation(note, note.GEOMETRY_PROPERTY, group)
+            animation.setDuration(self.ARRANGE_DURATION_MS)
+            animation.setStartValue(note.geometry())
+            animation.setEndValue(target)
+            animation.setEasingCurve(QEasingCurve.OutCubic)
+            group.addAnimation(animation)
+        group.finished.connect(lambda: self.saveNotes(list(geometries)))
+        self.arrange_animation = group
+        group.start()
+        
+    def finishArrangeAnimation(self):
+        """Доводит текущую перестановку заметок до конца (с сохранением)"""
+        if self.arrange_animation is not None:
+            group, self.arrange_animation = self.arrange_animation, None
+            if group.state() == QParallelAnimationGroup.Running:
+                group.setCurrentTime(group.totalDuration())
             
     def closeNote(self, note_id):
-        if note_id in self.notes:
-            note = self.notes.pop(note_id)
-            note.hide()
-            note.deleteLater()
-            self.saveNotes()
+        if note_id in self.records:
+            self.autosave.discard(note_id)
+            del self.records[note_id]
+            note = self.notes.pop(note_id, None)
+            if note is not None:
+                self.discardNoteWidget(note)
+            self.persistence.delete([note_id])
+            self.removeLegacyNoteSettings(note_id)
+            if self.search_index is not None:
+                self.search_index.remove(note_id)
+            self.tag_index.remove(note_id)
+            self.visible_ids.discard(note_id)
+            self.placement.remove(note_id)
+            self.selected_ids.discard(note_id)
+            
+    def workspaceNames(self):
+        """Имена всех рабочих столов"""
+        try:
+            names = json.loads(self.store.get_meta(NoteStore.WORKSPACES_KEY, "[]"))
+        except ValueError:
+            names = []
+        for name in (NOTE_DEFAULTS["workspace"], self.workspace):
+            if name not in names:
+                names.append(name)
+        return names
+        
+    def workspaceTitle(self, name):
+        """Название рабочего стола для меню"""
+        return "Основной" if name == NOTE_DEFAULTS["workspace"] else name
+        
+    def workspaceName(self, title):
+        """Имя рабочего стола по названию из меню"""
+        return NOTE_DEFAULTS["workspace"] if title == "Основной" else title
+        
+    def addWorkspace(self, name):
+        names = self.workspaceNames()
+        if name not in names:
+            names.append(name)
+        self.store.set_meta(NoteStore.WORKSPACES_KEY, json.dumps(names, ensure_ascii=False))
+        
+    def updateWorkspacesMenu(self):
+        """Заполняет меню рабочих столов в трее"""
+        self.workspaces_menu.clear()
+        for name in self.workspaceNames():
+            action = self.workspaces_menu.addAction(self.workspaceTitle(name),
+                                                    lambda name=name: self.switchWorkspace(name))
+            action.setCheckable(True)
+            action.setChecked(name == self.workspace)
+        self.workspaces_menu.addSeparator()
+        self.workspaces_menu.addAction("Новый рабочий стол…", self.createWorkspace)
+        
+    def createWorkspace(self):
+        """Создает рабочий стол и переключается на него"""
+        title, ok = QInputDialog.getText(None, "Новый рабочий стол", "Название:")
+        if ok and title.strip():
+            self.switchWorkspace(self.workspaceName(title.strip()))
+        
+    def switchWorkspace(self, name):
+        """Выгружает заметки текущего рабочего стола и загружает заметки другого"""
+        if name == self.workspace:
+            return
+        self.unloadNotes()
+        self.workspace = name
+        self.addWorkspace(name)
+        self.store.set_meta(NoteStore.ACTIVE_WORKSPACE_KEY, name)
+        self.loadNotes()
+        if not self.records:
+            self.createNewNote()
+            
+    def unloadNotes(self):
+        """Сохраняет и выгружает заметки рабочего стола, оставляя только записи на диске"""
+        self.finishArrangeAnimation()
+        self.saveNotes()
+        self.release_timer.stop()
+        for note_id in list(self.notes.keys()):
+            self.discardNoteWidget(self.notes.pop(note_id))
+        self.persistence.unload(list(self.records.keys()))
+        self.persistence.flush()
+        self.records = {}
+        self.visible_ids = set()
+        self.placement.clear()
+        self.selected_ids = set()
+        self.search_index = None
+        self.search_pending = []
+        self.search_index_timer.stop()
+        if self.search_popup is not None:
+            self.search_popup.hide()
+            
+    def moveNoteToWorkspace(self, note_id, name):
+        """Переносит заметку на другой рабочий стол"""
+        record = self.records.get(note_id)
+        if record is None:
+            return
+        self.addWorkspace(name)
+        if name == self.workspace:
+            return
+        record["workspace"] = name
+        self.saveNotes([note_id])
+        self.persistence.unload([note_id])
+        del self.records[note_id]
+        note = self.notes.pop(note_id, None)
+        if note is not None:
+            self.discardNoteWidget(note)
+        if self.search_index is not None:
+            self.search_index.remove(note_id)
+        self.tag_index.remove(note_id)
+        self.visible_ids.discard(note_id)
+        self.placement.remove(note_id)
+        self.selected_ids.discard(note_id)
+        
+    def showSearch(self):
+        """Открывает окно поиска по заметкам"""
+        if self.search_popup is None:
+            self.search_popup = NoteSearchPopup(self)
+        self.search_popup.popup()
+        
+    def searchNotes(self, query, limit=None):
+        """Ищет заметки по словам (последнее слово — по началу)"""
+        return self.prepareSearchIndex().search(query, limit)
+        
+    def fuzzySearchNotes(self, query, limit=20):
+        """Ищет заметки с учетом опечаток, раскладки и транслитерации"""
+        return [note_id for note_id, score in self.prepareSearchIndex().fuzzy_search(query, limit)]
+        
+    def startSearchIndexing(self):
+        """Начинает строить индекс поиска по записям рабочего стола небольшими порциями"""
+        self.search_index = InvertedIndex()
+        self.search_pending = list(self.records)
+        if self.search_pending:
+            self.search_index_timer.start(0)
+            
+    def indexSearchSlice(self):
+        """Индексирует заметки не дольше SEARCH_INDEX_SLICE_MS, чтобы не задерживать интерфейс"""
+        self.indexPendingNotes(time.perf_counter() + self.SEARCH_INDEX_SLICE_MS / 1000)
+        if self.search_pending:
+            self.search_index_timer.start(0)
+            
+    def indexPendingNotes(self, deadline=None):
+        """Добавляет в индекс поиска еще не проиндексированные заметки (до deadline)"""
+        while self.search_pending:
+            note_id = self.search_pending.pop()
+            # Закрытые и перенесенные заметки уже не в records
+            record = self.records.get(note_id)
+            if record is not None:
+                self.search_index.update(note_id, record["content"])
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        
+    def prepareSearchIndex(self):
+        """Достраивает индекс поиска, если он еще не готов, и досылает несохраненные правки"""
+        if self.search_index is None:
+            self.startSearchIndexing()
+        if self.search_pending:
+            self.search_index_timer.stop()
+            self.indexPendingNotes()
+        # Непосохраненные правки открытых заметок тоже должны находиться
+        for note_id in self.autosave.dirty:
+            note = self.notes.get(note_id)
+            if note is not None:
+                self.search_index.update(note_id, note.text_edit.toPlainText())
+        return self.search_index
+        
+    def noteTitle(self, note_id):
+        """Первая строка заметки для списков"""
+        note = self.notes.get(note_id)
+        content = note.text_edit.toPlainText() if note is not None else self.records[note_id]["content"]
+        first_line = content.strip().split("\n", 1)[0]
+        return first_line[:60] or f"Заметка {note_id}"
+        
+    def raiseNote(self, note_id, focus=True):
+        """Показывает заметку поверх остальных окон"""
+        note = self.showNote(note_id)
+        if note is None:
+            return
+        note.raise_()
+        if focus:
+            note.activateWindow()
+            note.text_edit.setFocus()
+        
+    def showHistory(self):
+        """Открывает историю версий заметок"""
+        self.flushPendingSaves()
+        titles = {}
+        for note_id in self.records:
+            titles[note_id] = self.noteTitle(note_id)
+        # Заметки других рабочих столов подписываются их рабочим столом, а не «закрыта»
+        other_ids = {note_id for note_id, _, _ in self.history.notes()} - set(self.records)
+        for note_id, record in self.journal.lookup(other_ids).items():
+            first_line = record["content"].strip().split("\n", 1)[0][:60] or f"Заметка {note_id}"
+            titles[note_id] = f"{first_line} (рабочий стол «{self.workspaceTitle(record['workspace'])}»)"
+            
+        dialog = NoteHistoryDialog(self.history, titles)
+        if dialog.exec_() == QDialog.Accepted and dialog.restored_text is not None:
+            self.restoreNoteContent(dialog.restored_note_id, dialog.restored_text)
+            
+    def restoreNoteContent(self, note_id, text):
+        """Возвращает заметке текст из истории
+        
+        Заметка с другого рабочего стола восстанавливается на месте, после
+        переключения на ее рабочий стол. Закрытая заметка создается заново.
+        """
+        if note_id not in self.records:
+            record = self.journal.lookup([note_id]).get(note_id)
+            if record is not None:
+                self.switchWorkspace(record["workspace"])
+        if note_id in self.records:
+            note = self.showNote(note_id)
+        else:
+            self.createNewNote()
+            note = self.notes[max(self.notes.keys())]
+        note.text_edit.setPlainText(text)
+        note.raise_()
+        note.activateWindow()
             
     def trayIconActivated(self, reason):
         if reason == QSystemTrayIcon.DoubleClick:
             self.createNewNote()
             
-    def saveNotes(self):
-        notes_data = {}
-        for note_id, note in self.notes.items():
-            notes_data[str(note_id)] = {
-                "content": note.text_edit.toPlainText(),
-                "color": note.color,
-                "font_family": note.font_family,
-                "font_size": note.font_size,
-                "text_color": note.text_color,
-                "width": note.width(),
-                "height": note.height(),
-                "always_on_top": note.always_on_top,
-                "pinned_to_screen": note.pinned_to_screen,
-                "theme": note.theme,
-                "gradient_color1": note.gradient_color1,
-                "gradient_color2": note.gradient_color2,
-                "gradient_direction": note.gradient_direction
-            }
-        
-        settings = QSettings("StickyNotes", "Notes")
-        settings.setValue("notes", json.dumps(notes_data))
+    def scheduleSave(self, note_id):
+        """Помечает заметку как измененную, запись произойдет позже"""
+        self.autosave.markDirty(note_id)
+        
+    def flushDirtyNotes(self, dirty_ids):
+        """Записывает накопленные изменения"""
+        self.saveNotes(dirty_ids)
+        
+    def showPersistenceError(self, message):
+        """Сообщает в трее, что заметки не удалось сохранить (не чаще раза в минуту)"""
+        now = time.monotonic()
+        if self.persistence_error_shown_at is not None and now - self.persistence_error_shown_at < 60:
+            return
+        self.persistence_error_shown_at = now
+        tray_icon = getattr(self, 'tray_icon', None)
+        if tray_icon is not None:
+            tray_icon.showMessage("Заметки не сохранены",
+                                  f"Не удалось записать изменения на диск: {message}",
+                                  QSystemTrayIcon.Warning, 10000)
+            
+    def flushPendingSaves(self, *args):
+        """Сбрасывает отложенные изменения на диск"""
+        self.autosave.flush()
+        self.persistence.flush()
+        
+    def shutdownPersistence(self):
+        """Сохраняет все и закрывает журнал перед выходом"""
+        self.autosave.flush()
+        self.persistence.stop()
+        self.journal.close()
+        
+    def saveNotes(self, note_ids=None):
+        """Сохраняет заметки (по умолчанию все) одной транзакцией"""
+        if note_ids is None:
+            note_ids = list(self.records.keys())
+        records = {}
+        for note_id in note_ids:
+            record = self.records.get(note_id)
+            if record is None:
+                continue
+            self.autosave.discard(note_id)
+            note = self.notes.get(note_id)
+            if note is not None:
+                record.update(note.toRecord())
+            records[note_id] = record
+            if self.search_index is not None:
+                self.search_index.update(note_id, record["content"])
+            self.tag_index.update(note_id, record)
+            self.updatePlacement(note_id, record)
+        self.persistence.save(records)
+        
+    def updatePlacement(self, note_id, record):
+        """Обновляет место заметки в индексе размещения"""
+        if record["visible"] and record["x"] is not None and record["y"] is not None:
+            self.placement.update(note_id, (record["x"], record["y"], record["width"], record["height"]))
+        else:
+            self.placement.remove(note_id)
         
     def loadNotes(self):
-        settings = QSettings("StickyNotes", "Notes")
-        notes_json = settings.value("notes", "{}")
-        
+        """Загружает записи заметок рабочего стола; окна создаются только для видимых"""
         try:
-            notes_data = json.loads(notes_json)
-            for note_id_str, note_data in notes_data.items():
-                note_id = int(note_id_str)
-                width = note_data.get("width", 300)
-                height = note_data.get("height", 300)
-                always_on_top = note_data.get("always_on_top", True)
-                pinned_to_screen = note_data.get("pinned_to_screen", False)
-                theme = note_data.get("theme", "default")
-                gradient_color1 = note_data.get("gradient_color1")
-                gradient_color2 = note_data.get("gradient_color2")
-                gradient_direction = note_data.get("gradient_direction", "horizontal")
-                
-                note = ResizableStickyNote(
-                    note_id,
-                    note_data.get("content", ""),
-                    note_data.get("color", "#FFFF99"),
-                    note_data.get("font_family", "Arial"),
-                    note_data.get("font_size", 10),
-                    note_data.get("text_color", "#000000"),
-                    (width, height),
-                    always_on_top,
-                    pinned_to_screen,
-                    theme,
-                    gradient_color1,
-                    gradient_color2,
-                    gradient_direction
-                )
-                note.main_window = self
+            self.records = self.journal.load(self.workspace)
+        except Exception as e:
+            print(f"Ошибка загрузки заметок: {e}")
+            return
+        self.tag_index.rebuild(self.records)
+        self.startSearchIndexing()
+        self.visible_ids = {note_id for note_id, record in self.records.items() if record["visible"]}
+        self.placement.clear()
+        for note_id in self.visible_ids:
+            self.updatePlacement(note_id, self.records[note_id])
+            
+        for note_id, note_data in self.records.items():
+            if not note_data["visible"]:
+                continue
+            try:
+                note = self.createNoteWidget(note_id, note_data)
                 note.show()
                 self.notes[note_id] = note
+            except Exception as e:
+                print(f"Ошибка загрузки заметки {note_id}: {e}")
+                
+    def removeLegacyNoteSettings(self, note_id):
+        """Удаляет старые ключи note_{id}_* удаленной заметки из QSettings"""
+        settings = QSettings("StickyNotes", "NoteSettings")
+        # Ключи известны заранее: полный обход allKeys остается для compactLegacySettings
+        for field in ("geometry",) + self.LEGACY_NOTE_FIELDS:
+            settings.remove(f"note_{note_id}_{field}")
+                
+    def compactLegacySettings(self):
+        """Удаляет из QSettings ключи note_{id}_* заметок, которых больше нет"""
+        settings = QSettings("StickyNotes", "NoteSettings")
+        # Заметки других рабочих столов не загружены, но тоже существуют
+        existing = self.store.note_ids() | set(self.records)
+        removed = 0
+        reclaimed = 0
+        for key in settings.allKeys():
+            match = re.match(r"note_(\d+)_", key)
+            if not match or int(match.group(1)) in existing:
+                continue
+            reclaimed += len(key) + len(str(settings.value(key)))
+            settings.remove(key)
+            removed += 1
+        if removed:
+            settings.sync()
+            print(f"Удалено устаревших настроек заметок: {removed} (~{reclaimed} байт)")
+        return removed, reclaimed
+        
+    def migrateLegacyNotes(self):
+        """Однократно переносит заметки из QSettings в базу данных"""
+        if self.store.is_legacy_migrated():
+            return
+            
+        legacy = QSettings("StickyNotes", "Notes")
+        try:
+            notes_data = json.loads(legacy.value("notes", "{}"))
         except Exception as e:
-            print(f"Ошибка загрузки заметок: {e}")
+            print(f"Ошибка чтения старых заметок: {e}")
+            notes_data = {}
+            
+        note_settings = QSettings("StickyNotes", "NoteSettings")
+        records = {}
+        for note_id_str, note_data in notes_data.items():
+            note_id = int(note_id_str)
+            record = dict(note_data)
+            geometry = note_settings.value(f"note_{note_id}_geometry")
+            if isinstance(geometry, QRect):
+                record.update(x=geometry.x(), y=geometry.y(),
+                              width=geometry.width(), height=geometry.height())
+            for key in self.LEGACY_NOTE_FIELDS:
+                value = note_settings.value(f"note_{note_id}_{key}")
+                if value is not None:
+                    record[key] = value
+            records[note_id] = record
+            
+        self.store.migrate_legacy(records)
+        if records:
+            print(f"Перенесено заметок из QSettings: {len(records)}")
     
     def exitApp(self):
-        self.saveNotes()
+        if self.autosave.hasPending():
+            self.autosave.flush()
+        else:
+            self.saveNotes()
+        self.persistence.flush()
+        stats = self.autosave.stats()
+        print(f"Автосохранение: изменений {stats['marks']}, записей {stats['writes']}, "
+              f"объединено {stats['coalesced']}")
         self.app.quit()
 
 if __name__ == "__main__":